@@ -0,0 +1,85 @@
+"""
+Benchmark the "nothing changed" scan of the PDF store.
+
+Compares the stat-based check against re-hashing every file with streamed SHA-256
+and against the whole-file MD5 read of the first version and the streamed BLAKE2b
+that followed it. Files are random bytes named *.pdf;
+with --cold they are evicted from the page cache before each hashing pass.
+
+Usage (from the repository root):
+    python benchmarks/bench_change_scan.py [--files 500] [--size-mb 4] [--cold]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from process_pdfs import compute_file_hash, find_changed_files, hash_file, make_file_record  # noqa: E402
+
+
+def legacy_md5(file: str) -> str:
+    hasher = hashlib.md5()
+    with open(file, "rb") as f:
+        hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def evict(files: list) -> None:
+    for file in files:
+        fd = os.open(file, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def timed(label: str, fn, *args) -> None:
+    start = time.perf_counter()
+    fn(*args)
+    print(f"{label:<28} {time.perf_counter() - start:8.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--cold", action="store_true", help="evict files from the page cache before hashing")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    size = int(args.size_mb * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f"book_{i:05d}.pdf")
+            with open(path, "wb") as f:
+                f.write(os.urandom(size))
+            files.append(path)
+
+        manifest = {path: make_file_record(compute_file_hash(path), os.stat(path)) for path in files}
+        print(f"{args.files} files, {args.files * size / 1024 ** 3:.2f} GB")
+
+        timed("stat scan (no change)", find_changed_files, files, manifest)
+
+        if args.cold:
+            evict(files)
+        timed("streamed SHA-256 of all", lambda: [compute_file_hash(path) for path in files])
+
+        if args.cold:
+            evict(files)
+        timed("streamed BLAKE2b of all", lambda: [hash_file(path, "blake2b") for path in files])
+
+        if args.cold:
+            evict(files)
+        timed("whole-file MD5 of all", lambda: [legacy_md5(path) for path in files])
+
+
+if __name__ == "__main__":
+    main()
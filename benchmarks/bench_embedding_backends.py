@@ -0,0 +1,113 @@
+"""
+Benchmark the embedding backends and check that they agree.
+
+Embeds a set of rulebook-like chunks (a mix of full-length prose chunks and
+short table fragments) and short queries with each backend. Reports model load
+time, single-query latency as at /search (one query per call) and bulk
+throughput in chunks per second as at ingest. The vectors of every backend are
+compared with the first one's; the script exits with status 1 if any cosine
+distance exceeds the parity tolerance.
+
+Usage (from the repository root):
+    python benchmarks/bench_embedding_backends.py [--backends sentence-transformers onnx] [--chunks 1000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from config import EMBEDDING_MODEL_NAME  # noqa: E402
+from embedding_backends import PARITY_TOLERANCE, create_embedding_backend  # noqa: E402
+from synthetic_pdf import WORDS  # noqa: E402
+
+
+def generate_chunks(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(count):
+        if rng.random() < 0.3:
+            # A table fragment
+            rows = [" | ".join(rng.choice(WORDS) for _ in range(4)) for _ in range(rng.randint(2, 6))]
+            chunks.append("\n".join(rows))
+        else:
+            sentences = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+                for _ in range(rng.randint(10, 20))
+            ]
+            chunks.append(" ".join(sentences))
+    return chunks
+
+
+def generate_queries(count: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [f"How does {' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))} work?" for _ in range(count)]
+
+
+def cosine_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return 1 - (a * b).sum(axis=1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["sentence-transformers", "onnx"], help="backends to compare")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="embedding model")
+    parser.add_argument("--chunks", type=int, default=1000, help="chunks to embed in bulk")
+    parser.add_argument("--queries", type=int, default=200, help="queries to embed one at a time")
+    parser.add_argument("--batch-tokens", type=int, help="tokens per bulk batch (default: sized to available memory)")
+    args = parser.parse_args()
+
+    chunks = generate_chunks(args.chunks)
+    queries = generate_queries(args.queries)
+    vectors: Dict[str, np.ndarray] = {}
+
+    for name in args.backends:
+        start = time.perf_counter()
+        backend = create_embedding_backend(name, args.model)
+        load_seconds = time.perf_counter() - start
+
+        backend.encode(queries[:5])  # warm-up
+        latencies = []
+        query_vectors = []
+        for query in queries:
+            start = time.perf_counter()
+            query_vectors.append(backend.encode([query])[0])
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        chunk_vectors = backend.encode(chunks, args.batch_tokens)
+        bulk_seconds = time.perf_counter() - start
+
+        latencies.sort()
+        print(
+            f"{name}: loaded in {load_seconds:.1f}s, query latency p50 {statistics.median(latencies) * 1000:.1f} ms "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, "
+            f"bulk {len(chunks) / bulk_seconds:.1f} chunks/s ({bulk_seconds:.1f}s for {len(chunks)})"
+        )
+        vectors[name] = np.vstack([np.array(query_vectors), chunk_vectors])
+
+    reference = args.backends[0]
+    failed = False
+    for name in args.backends[1:]:
+        distances = cosine_distances(vectors[reference], vectors[name])
+        ok = distances.max() <= PARITY_TOLERANCE
+        failed |= not ok
+        print(
+            f"parity {name} vs {reference}: max cosine distance {distances.max():.2e}, "
+            f"mean {distances.mean():.2e} (tolerance {PARITY_TOLERANCE:.0e}): {'ok' if ok else 'FAILED'}"
+        )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
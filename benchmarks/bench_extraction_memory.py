@@ -0,0 +1,76 @@
+"""
+Measure peak RSS of the streaming extract -> split pipeline against page count.
+
+Each measurement runs in a fresh process on a synthetic PDF, so the numbers are
+independent. The baseline is taken once the text splitter is built, which with
+token chunking means once the embedding model is loaded, so the growth over it
+is what extraction and splitting take. With pages released as they are
+extracted, it should stay roughly flat from the smallest to the 1000-page book.
+--unit characters measures with character chunking, without loading the model.
+
+Usage (from the repository root):
+    python benchmarks/bench_extraction_memory.py [--pages 250 500 1000] [--unit characters]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from config import CHUNK_LENGTH_UNIT  # noqa: E402
+from synthetic_pdf import write_synthetic_pdf  # noqa: E402
+
+
+def measure(pdf: str, unit: str) -> None:
+    """
+    Child process: run extraction and splitting over the PDF and print peak RSS.
+    """
+    import process_pdfs
+
+    process_pdfs.CHUNK_LENGTH_UNIT = unit
+    process_pdfs.get_chunking()
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    chunk_count = sum(1 for _ in process_pdfs.split_pages(process_pdfs.iter_page_texts(pdf)))
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{chunk_count} {elapsed:.2f} {baseline_kb} {peak_kb}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[250, 500, 1000])
+    parser.add_argument("--lines-per-page", type=int, default=40)
+    parser.add_argument("--unit", choices=["tokens", "characters"], default=CHUNK_LENGTH_UNIT, help="chunk length unit")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.child, args.unit)
+        return
+
+    print(f"{'pages':>6} {'chunks':>7} {'time':>8} {'baseline RSS':>13} {'peak RSS':>9} {'growth':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            pdf = write_synthetic_pdf(
+                os.path.join(tmp, f"synthetic_{pages}.pdf"), pages,
+                lines_per_page=args.lines_per_page, table_every=10
+            )
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", pdf, "--unit", args.unit],
+                check=True, capture_output=True, text=True
+            ).stdout.split()
+            chunks, elapsed, baseline_kb, peak_kb = int(output[0]), float(output[1]), int(output[2]), int(output[3])
+            print(
+                f"{pages:>6} {chunks:>7} {elapsed:>7.1f}s {baseline_kb / 1024:>11.0f}MB "
+                f"{peak_kb / 1024:>7.0f}MB {(peak_kb - baseline_kb) / 1024:>6.0f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare the PDF text extractors: pages per second of each backend, and a
+text-parity report of the pdfium fast path against pdfplumber.
+
+Parity is measured per page on the formatted page text (what gets chunked):
+pages with byte-identical text are counted, and the word-level similarity
+of the others is reported with the least similar pages listed.
+
+Usage (from the repository root):
+    python benchmarks/bench_extractors.py [--pdf book.pdf] [--pages 200] [--table-every 10]
+"""
+import argparse
+import difflib
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from pdf_extractors import PdfiumExtractor, PdfplumberExtractor  # noqa: E402
+from process_pdfs import format_page  # noqa: E402
+from synthetic_pdf import write_synthetic_pdf  # noqa: E402
+
+
+def extract(extractor, pdf: str):
+    start = time.perf_counter()
+    pages = [format_page(content) for content in extractor.iter_pages(pdf)]
+    return pages, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to extract (a synthetic one is generated if omitted)")
+    parser.add_argument("--pages", type=int, default=200, help="pages of the synthetic PDF")
+    parser.add_argument("--table-every", type=int, default=10, help="put a table on every n-th synthetic page")
+    parser.add_argument("--worst", type=int, default=5, help="number of least similar pages to list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = args.pdf or write_synthetic_pdf(
+            os.path.join(tmp, "synthetic.pdf"), args.pages, table_every=args.table_every
+        )
+        pdfium_extractor = PdfiumExtractor()
+        plumber_pages, plumber_time = extract(PdfplumberExtractor(), pdf)
+        pdfium_pages, pdfium_time = extract(pdfium_extractor, pdf)
+
+    n = len(plumber_pages)
+    print(f"pdfplumber: {n / plumber_time:8.1f} pages/s ({plumber_time:.2f}s for {n} pages)")
+    print(
+        f"pdfium:     {n / pdfium_time:8.1f} pages/s ({pdfium_time:.2f}s, {plumber_time / pdfium_time:.1f}x), "
+        f"{pdfium_extractor.text_pages} pages via PDFium, {pdfium_extractor.table_pages} handed to pdfplumber"
+    )
+
+    identical = 0
+    similarities = []
+    for page_number, (plumber_text, pdfium_text) in enumerate(zip(plumber_pages, pdfium_pages), start=1):
+        if plumber_text == pdfium_text:
+            identical += 1
+            continue
+        ratio = difflib.SequenceMatcher(None, plumber_text.split(), pdfium_text.split(), autojunk=False).ratio()
+        similarities.append((ratio, page_number))
+
+    mean = (identical + sum(ratio for ratio, _ in similarities)) / n if n else 1.0
+    print(f"parity: {identical}/{n} pages byte-identical, mean word similarity {mean:.4f}")
+    for ratio, page_number in sorted(similarities)[:args.worst]:
+        print(f"  page {page_number}: word similarity {ratio:.4f}")
+
+
+if __name__ == "__main__":
+    main()
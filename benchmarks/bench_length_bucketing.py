@@ -0,0 +1,89 @@
+"""
+Benchmark length-bucketed embedding batches against the batches the backend used before.
+
+Chunks a PDF (a synthetic one with tables by default) with the token-aware
+splitter, then embeds the chunks twice: in the backend's previous batches of
+32 (sorted by character length for sentence-transformers, whose encode already
+did that; in document order for ONNX), and as the ingestion embedder does now,
+sorted by token length into batches of similar lengths sized to the available
+memory. Reports the chunk length distribution, the share of encoder tokens that
+are padding, throughput and how much the vectors differ.
+
+Usage (from the repository root):
+    python benchmarks/bench_length_bucketing.py [--pdf book.pdf ...] [--pages 200] [--backend onnx]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from config import CHUNK_OVERLAP_TOKENS, EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME  # noqa: E402
+from embedding_backends import PaddingStats, available_memory, batch_token_budget, create_embedding_backend  # noqa: E402
+from process_pdfs import extract_text_from_pdf, separators  # noqa: E402
+from synthetic_pdf import write_synthetic_pdf  # noqa: E402
+from token_splitter import TokenAwareTextSplitter  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="*", help="PDFs to chunk (a synthetic one is generated if omitted)")
+    parser.add_argument("--pages", type=int, default=200, help="pages of the synthetic PDF")
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, help="embedding backend")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="embedding model")
+    parser.add_argument("--batch-tokens", type=int, help="tokens per bucketed batch (default: sized to available memory)")
+    args = parser.parse_args()
+
+    backend = create_embedding_backend(args.backend, args.model)
+    limit = backend.max_seq_length - backend.special_tokens
+    splitter = TokenAwareTextSplitter(backend.tokenizer, limit, CHUNK_OVERLAP_TOKENS, separators)
+    with tempfile.TemporaryDirectory() as tmp:
+        pdfs = args.pdf or [write_synthetic_pdf(os.path.join(tmp, "synthetic.pdf"), args.pages, table_every=3)]
+        chunks = [chunk for pdf in pdfs for chunk in splitter.split_text(extract_text_from_pdf(pdf))]
+
+    lengths = np.array(splitter.count_tokens(chunks)) + backend.special_tokens
+    print(
+        f"{len(chunks)} chunks, tokens per chunk: p10 {np.percentile(lengths, 10):.0f}, "
+        f"median {np.median(lengths):.0f}, p90 {np.percentile(lengths, 90):.0f}, max {lengths.max()}"
+    )
+    memory = available_memory()
+    budget = args.batch_tokens or batch_token_budget(backend.dimension, backend.max_seq_length)
+    print(
+        f"bucketed batch budget: {budget} tokens "
+        f"({'MemAvailable unknown' if memory is None else f'MemAvailable {memory / 1024 ** 3:.1f} GB'})"
+    )
+    backend.encode(chunks[:8])  # warm-up
+
+    results = {}
+    for mode in (backend.padding.previous, "length-bucketed"):
+        backend.padding = PaddingStats(backend.padding.previous)
+        start = time.perf_counter()
+        if mode != "length-bucketed":
+            # A budget no batch reaches keeps each previous batch in one batch
+            vectors = np.empty((len(chunks), backend.dimension), dtype=np.float32)
+            for batch in backend.previous_batches(chunks):
+                vectors[batch] = backend.encode([chunks[i] for i in batch], max_batch_tokens=1 << 62)
+        else:
+            vectors = backend.encode(chunks, args.batch_tokens)
+        seconds = time.perf_counter() - start
+        padding = backend.padding
+        results[mode] = (vectors, seconds)
+        print(
+            f"{mode}: padding {padding.ratio(padding.tokens, padding.padded):.1%} of "
+            f"{padding.padded} encoder tokens, {len(chunks) / seconds:.1f} chunks/s ({seconds:.1f}s)"
+        )
+
+    (previous, previous_seconds), (bucketed, bucketed_seconds) = results.values()
+    print(
+        f"speedup {previous_seconds / bucketed_seconds:.2f}x, "
+        f"max abs difference between the vectors {np.abs(previous - bucketed).max():.1e}"
+    )
+
+
+if __name__ == "__main__":
+    main()
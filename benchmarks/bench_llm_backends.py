@@ -0,0 +1,62 @@
+"""
+Compare per-request latency of the llama.cpp backends.
+
+The subprocess backend reloads the GGUF model on every request, the server
+backend keeps it resident, so the difference is mostly model load time.
+
+Usage (from the repository root):
+    python benchmarks/bench_llm_backends.py --requests 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from llm_integration import LLMIntegration  # noqa: E402
+
+CONTEXT = (
+    "Critical Hits. When you score a critical hit, you get to roll extra dice for the attack's "
+    "damage against the target. Roll all of the attack's damage dice twice and add them together."
+)
+QUERY = "How do critical hits work?"
+
+
+def run(backend: str, n_requests: int) -> list:
+    llm = LLMIntegration(backend=backend)
+    if llm.backend.name != backend:
+        print(f"{backend}: backend unavailable, skipped")
+        llm.close()
+        return []
+
+    latencies = []
+    try:
+        for _ in range(n_requests):
+            start = time.perf_counter()
+            llm.generate_response(QUERY, CONTEXT)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        llm.close()
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5, help="requests per backend")
+    parser.add_argument("--backends", nargs="+", default=["subprocess", "server"])
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        latencies = run(backend, args.requests)
+        if not latencies:
+            continue
+        print(
+            f"{backend:>10}: n={len(latencies)} mean={statistics.mean(latencies):.2f}s "
+            f"median={statistics.median(latencies):.2f}s min={min(latencies):.2f}s max={max(latencies):.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
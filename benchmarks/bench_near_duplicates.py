@@ -0,0 +1,148 @@
+"""
+Benchmark building the MinHash LSH near-duplicate index, and its precision and
+recall on planted near-duplicates.
+
+Generates rulebook-like chunks, a share of which are reprints of earlier chunks
+with the kinds of differences that escape exact deduplication (reflowed
+whitespace, words hyphenated across line breaks, a page header), and a share
+of which are edits of earlier chunks (one changed word, such as a number in a
+rule) that must not be merged. Every chunk is queried against the index and
+its candidates are checked with same_text; a chunk with no near-duplicate is
+added to the index, as at ingest. Reports the time spent hashing, in the
+SQLite index and checking candidates, how many reprints were found and how
+many edits and unrelated chunks were wrongly merged.
+
+Usage (from the repository root):
+    python benchmarks/bench_near_duplicates.py [--chunks 500000] [--words 250] [--threshold 0.95]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from config import MINHASH_PERMUTATIONS, NEAR_DUPLICATE_THRESHOLD  # noqa: E402
+from near_duplicates import NearDuplicateIndex, same_text  # noqa: E402
+from synthetic_pdf import WORDS  # noqa: E402
+
+# Reprints say the same as the original and should be merged with it; edits should not
+REPRINTS = ("whitespace", "hyphenation", "header")
+EDITS = ("word", "number")
+VARIANTS = REPRINTS + EDITS
+
+
+def vocabulary(rng: random.Random, size: int = 20000) -> List[str]:
+    syllables = ["ka", "ro", "mi", "th", "el", "an", "dr", "or", "is", "ul", "en", "ax", "qu", "ve", "sh"]
+    words = {"".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(size)}
+    return WORDS + sorted(words)
+
+
+def reprint(rng: random.Random, text: str, variant: str, words: List[str]) -> str:
+    tokens = text.split(" ")
+    if variant == "whitespace":
+        return "".join(token + rng.choice([" ", "  ", "\n", " \n "]) for token in tokens).strip()
+    if variant == "hyphenation":
+        for i in rng.sample(range(len(tokens)), 5):
+            if len(tokens[i]) > 3:
+                cut = len(tokens[i]) // 2
+                tokens[i] = f"{tokens[i][:cut]}-\n{tokens[i][cut:]}"
+        return " ".join(tokens)
+    if variant == "header":
+        return f"Chapter {rng.randint(1, 12)} | Core Rules {rng.randint(1, 300)}\n" + text
+    i = rng.randrange(len(tokens))
+    original = tokens[i]
+    while tokens[i] == original:
+        if variant == "number":
+            tokens[i] = f"{rng.randint(1, 10)}d{rng.choice([4, 6, 8, 10, 12])}"
+        else:
+            tokens[i] = rng.choice(words)
+    return " ".join(tokens)
+
+
+def generate(count: int, length: int, share: float, seed: int = 0) -> List[Tuple[str, Optional[str]]]:
+    """
+    Generate chunks as (text, how it was reprinted or None for original chunks).
+    """
+    rng = random.Random(seed)
+    words = vocabulary(rng)
+    chunks: List[Tuple[str, Optional[str]]] = []
+    originals: List[int] = []
+    for i in range(count):
+        if originals and rng.random() < share:
+            variant = rng.choice(VARIANTS)
+            chunks.append((reprint(rng, chunks[rng.choice(originals)][0], variant, words), variant))
+        else:
+            chunks.append((" ".join(rng.choice(words) for _ in range(length)), None))
+            originals.append(i)
+    return chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=500_000, help="number of chunks")
+    parser.add_argument("--words", type=int, default=250, help="words per chunk")
+    parser.add_argument("--share", type=float, default=0.1, help="share of chunks that are reprints or edits")
+    parser.add_argument("--threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD or 0.95, help="similarity threshold")
+    parser.add_argument("--permutations", type=int, default=MINHASH_PERMUTATIONS, help="MinHash permutations")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    chunks = generate(args.chunks, args.words, args.share)
+    print(f"generated {len(chunks)} chunks of {args.words} words in {time.perf_counter() - start:.1f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = NearDuplicateIndex(os.path.join(tmp, "index.sqlite3"), args.threshold, args.permutations)
+        print(f"{args.permutations} permutations in {index.bands} bands of {index.rows} rows")
+
+        hash_seconds = index_seconds = check_seconds = 0.0
+        merged = {variant: 0 for variant in VARIANTS}
+        planted = {variant: 0 for variant in VARIANTS}
+        unrelated = 0
+        for i, (text, variant) in enumerate(chunks):
+            start = time.perf_counter()
+            signature = index.hasher.signature(text)
+            hash_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            candidates = index.query(signature)
+            index_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            match = any(same_text(text, chunks[int(key)][0]) for key, _ in candidates)
+            check_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            if not match:
+                index.add([(str(i), signature)])
+            if i % 10_000 == 0:
+                index.commit()
+            index_seconds += time.perf_counter() - start
+
+            if variant is not None:
+                planted[variant] += 1
+                merged[variant] += match
+            elif match:
+                unrelated += 1
+        index.commit()
+        size = os.path.getsize(os.path.join(tmp, "index.sqlite3"))
+
+    total = hash_seconds + index_seconds + check_seconds
+    print(
+        f"build: {total:.1f}s ({len(chunks) / total:,.0f} chunks/s): {hash_seconds:.1f}s MinHash, "
+        f"{index_seconds:.1f}s SQLite query and insert, {check_seconds:.1f}s checking candidates, "
+        f"{size / 1024 / 1024:.0f} MB index"
+    )
+    for variant in REPRINTS:
+        print(f"reprints ({variant}) found: {merged[variant]} of {planted[variant]} ({merged[variant] / max(planted[variant], 1):.1%})")
+    for variant in EDITS:
+        print(f"edits ({variant}) wrongly merged: {merged[variant]} of {planted[variant]}")
+    print(f"unrelated chunks merged: {unrelated}")
+
+
+if __name__ == "__main__":
+    main()
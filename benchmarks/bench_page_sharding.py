@@ -0,0 +1,51 @@
+"""
+Check that page-range sharded extraction gives byte-identical text to the
+serial path, and compare their wall time.
+
+Exits with status 1 if the two outputs differ.
+
+Usage (from the repository root):
+    python benchmarks/bench_page_sharding.py [--pdf book.pdf] [--pages 300] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from process_pdfs import extract_text_from_pdf  # noqa: E402
+from synthetic_pdf import write_synthetic_pdf  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to extract (a synthetic one is generated if omitted)")
+    parser.add_argument("--pages", type=int, default=300, help="pages of the synthetic PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = args.pdf or write_synthetic_pdf(os.path.join(tmp, "synthetic.pdf"), args.pages, table_every=10)
+
+        start = time.perf_counter()
+        serial = extract_text_from_pdf(pdf)
+        serial_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sharded = extract_text_from_pdf(pdf, workers=args.workers)
+        sharded_time = time.perf_counter() - start
+
+    print(f"serial:  {serial_time:.2f}s")
+    print(f"sharded: {sharded_time:.2f}s ({args.workers} workers, {serial_time / sharded_time:.2f}x)")
+
+    if serial.encode() != sharded.encode():
+        print("FAIL: sharded extraction differs from serial extraction")
+        sys.exit(1)
+    print(f"OK: outputs are byte-identical ({len(serial.encode())} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark the built-in RecursiveTextSplitter against langchain's
+RecursiveCharacterTextSplitter.
+
+Measures splitting throughput on book-sized text, and the import time and
+memory of each splitter's module in a fresh interpreter. The two split at
+about the same speed; what the built-in splitter saves is langchain's import
+time and memory in every ingestion process. That the chunks are identical is
+checked by tests/test_splitter.py.
+
+Usage (from the repository root):
+    python benchmarks/bench_splitter.py [--pdf book.pdf] [--mb 4]
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: E402
+
+from config import CHUNK_OVERLAP, CHUNK_SIZE  # noqa: E402
+from splitter import RecursiveTextSplitter  # noqa: E402
+from synthetic_pdf import WORDS  # noqa: E402
+
+SEPARATORS = ["\n\n", "\n", ".", " ", ""]
+
+
+def book_text(size: int, seed: int = 0) -> str:
+    """
+    Generate rulebook-like text of about size characters, with pages, paragraphs and tables.
+    """
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    page = 1
+    while length < size:
+        lines = []
+        for _ in range(rng.randint(20, 50)):
+            line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16)))
+            lines.append(line.capitalize() + rng.choice([".", ".", ",", ":", ""]))
+            if rng.random() < 0.15:
+                lines.append("")
+        if rng.random() < 0.2:
+            lines.append(f"\n[Page {page} Table]")
+            lines.extend(" | ".join(rng.choice(WORDS) for _ in range(3)) for _ in range(4))
+        lines.append(f"(Page {page})\n")
+        text = "\n".join(lines)
+        parts.append(text)
+        length += len(text)
+        page += 1
+    return "".join(parts)
+
+
+def throughput(splitter, text: str) -> float:
+    start = time.perf_counter()
+    splitter.split_text(text)
+    return time.perf_counter() - start
+
+
+def import_cost(module: str) -> str:
+    """
+    Import a module in a fresh interpreter and report the time and memory (RSS growth) it took.
+    """
+    code = (
+        "import re, sys, time\n"
+        "rss = lambda: int(re.search(r'VmRSS:\\s+(\\d+)', open('/proc/self/status').read()).group(1)) / 1024\n"
+        f"sys.path.insert(0, {os.path.join(BENCH_DIR, '..', 'src')!r})\n"
+        "before, start = rss(), time.perf_counter()\n"
+        f"import {module}\n"
+        "print(f'{time.perf_counter() - start:.2f}s, +{rss() - before:.0f} MB RSS')"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return f"failed ({result.stderr.strip().splitlines()[-1]})"
+    return result.stdout.strip()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="time the extracted text of this PDF instead of generated text")
+    parser.add_argument("--mb", type=float, default=4, help="size of the generated book text in MB")
+    args = parser.parse_args()
+
+    if args.pdf:
+        from process_pdfs import extract_text_from_pdf
+        book = extract_text_from_pdf(args.pdf)
+    else:
+        book = book_text(int(args.mb * 1024 * 1024))
+
+    mb = len(book.encode()) / 1024 / 1024
+    reference = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separators=SEPARATORS)
+    native = RecursiveTextSplitter(CHUNK_SIZE, CHUNK_OVERLAP, SEPARATORS)
+    reference_time = throughput(reference, book)
+    native_time = throughput(native, book)
+    print(f"langchain: {mb / reference_time:6.1f} MB/s ({reference_time:.2f}s for {mb:.1f} MB)")
+    print(f"native:    {mb / native_time:6.1f} MB/s ({native_time:.2f}s, {reference_time / native_time:.1f}x)")
+    for module in ("langchain.text_splitter", "langchain_text_splitters", "splitter"):
+        print(f"import {module}: {import_cost(module)}")
+
+
+if __name__ == "__main__":
+    main()
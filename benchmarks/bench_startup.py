@@ -0,0 +1,171 @@
+"""
+Benchmark the startup cost of an ingestion run that finds nothing to ingest.
+
+Writes a PDF store of synthetic PDFs and a manifest in which all of them are
+current, then runs the no-change path of process_pdfs (import, manifest, scan,
+reports) in fresh processes, as a cron job would. Reports the wall time of the
+whole process, the import and scan times, peak RSS and whether ChromaDB or
+torch were imported. With --eager, also times what building the ChromaDB
+client and embedding model at import time used to add.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py [--files 200] [--runs 5] [--eager]
+"""
+import argparse
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic_pdf import write_synthetic_pdf  # noqa: E402
+
+HEAVY_MODULES = ("chromadb", "sentence_transformers", "torch")
+
+
+def use_data_directory(data: str) -> None:
+    """
+    Point every data path of the configuration into the benchmark's directory.
+    """
+    import config
+
+    config.PDF_STORE = os.path.join(data, "pdfs")
+    config.MANIFEST_PATH = os.path.join(data, "manifest.sqlite3")
+    config.HASH_FILE_PATH = os.path.join(data, "processed_files.json")
+    config.CHROMADB_PATH = os.path.join(data, "db")
+    config.EMBEDDING_CACHE_PATH = os.path.join(data, "embedding_cache")
+    config.PAGE_CACHE_PATH = os.path.join(data, "page_cache")
+    config.NEAR_DUPLICATE_INDEX_PATH = os.path.join(data, "near_duplicates.sqlite3")
+    config.CHUNK_STORE_LOCK_PATH = os.path.join(data, "chunk_store.lock")
+
+
+def prepare(data: str, files: int) -> None:
+    """
+    Write the PDF store and a manifest in which every file is already ingested.
+    """
+    use_data_directory(data)
+    from manifest import Manifest
+    from pdf_extractors import EXTRACTION_VERSION
+    from process_pdfs import STORAGE_VERSION, compute_file_hash, make_file_record
+
+    pdf_store = os.path.join(data, "pdfs")
+    os.makedirs(pdf_store)
+    template = write_synthetic_pdf(os.path.join(data, "template.pdf"), 5)
+    with open(template, "rb") as f:
+        content = f.read()
+
+    processed_files = Manifest(os.path.join(data, "manifest.sqlite3"))
+    for i in range(files):
+        path = os.path.join(pdf_store, f"book_{i:04d}.pdf")
+        with open(path, "wb") as f:
+            # Distinct content per file, as in a real library
+            f.write(content + f"% {i}\n".encode())
+        record = make_file_record(compute_file_hash(path), os.stat(path))
+        processed_files[path] = {
+            **record, "pages": [], "chunks": [], "format": EXTRACTION_VERSION, "storage": STORAGE_VERSION
+        }
+
+
+def run_no_change(data: str, workers: int) -> None:
+    """
+    Child process: run the no-change path of process_pdfs and print its timings.
+    """
+    use_data_directory(data)
+    start = time.perf_counter()
+    import process_pdfs
+    imported = time.perf_counter()
+
+    process_pdfs.confirm_project_paths()
+    processed_files = process_pdfs.load_processed_files()
+    pdf_files = process_pdfs.list_pdf_files()
+    process_pdfs.remove_deleted_files(pdf_files, processed_files)
+    if workers > 1 and len(pdf_files) > 1:
+        process_pdfs.ingest_parallel(pdf_files, processed_files, workers)
+    else:
+        process_pdfs.ingest_serial(pdf_files, processed_files, workers)
+    if process_pdfs.is_loaded(process_pdfs.get_embedding_cache):
+        process_pdfs.get_embedding_cache().report()
+    if process_pdfs.is_loaded(process_pdfs.get_chunk_store):
+        process_pdfs.get_chunk_store().report(processed_files.chunk_count())
+    process_pdfs.get_page_cache().prune(processed_files.replaced_hashes, processed_files.file_hashes())
+    scanned = time.perf_counter()
+
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules] or ["none"]
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{imported - start:.3f} {scanned - imported:.3f} {peak_kb} {','.join(heavy)}")
+
+
+def run_eager(data: str) -> None:
+    """
+    Child process: build the ChromaDB client and embedding model as importing process_pdfs used to.
+    """
+    use_data_directory(data)
+    import config
+
+    start = time.perf_counter()
+    import chromadb
+    from sentence_transformers import SentenceTransformer
+
+    client = chromadb.PersistentClient(path=config.CHROMADB_PATH)
+    client.get_or_create_collection(config.DB_COLLECTION)
+    SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{time.perf_counter() - start:.3f} {peak_kb}")
+
+
+def child(*args: str) -> str:
+    return subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *args], check=True, capture_output=True, text=True
+    ).stdout.split("\n")[-2]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200, help="PDFs in the store")
+    parser.add_argument("--runs", type=int, default=5, help="no-change runs to time")
+    parser.add_argument("--workers", type=int, default=1, help="extraction workers of the runs")
+    parser.add_argument("--eager", action="store_true", help="also time loading ChromaDB and the model up front")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "DATA"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, data = args.child
+        if mode == "scan":
+            run_no_change(data, args.workers)
+        else:
+            run_eager(data)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepare(tmp, args.files)
+        walls, imports, scans, peaks = [], [], [], []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            import_seconds, scan_seconds, peak_kb, heavy = child("--workers", str(args.workers), "--child", "scan", tmp).split()
+            walls.append(time.perf_counter() - start)
+            imports.append(float(import_seconds))
+            scans.append(float(scan_seconds))
+            peaks.append(int(peak_kb))
+
+        print(
+            f"no-change run over {args.files} files (median of {args.runs}): {statistics.median(walls):.3f}s wall, "
+            f"{statistics.median(imports):.3f}s importing process_pdfs, {statistics.median(scans):.3f}s scanning, "
+            f"peak RSS {max(peaks) / 1024:.0f} MB, heavy modules imported: {heavy}"
+        )
+
+        if args.eager:
+            try:
+                eager_seconds, eager_kb = child("--child", "eager", tmp).split()
+            except subprocess.CalledProcessError as e:
+                print(f"eager load failed: {e.stderr.strip().splitlines()[-1]}")
+                return
+            print(f"eager ChromaDB client and model load: {float(eager_seconds):.3f}s, peak RSS {int(eager_kb) / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Report how the character-based chunk settings fit the embedding model's
+token limit, compared with the tokenizer-aware chunker.
+
+For each chunker the chunks are tokenized with the model's tokenizer and the
+report shows the chunk count, how many chunks exceed the model's max sequence
+length (and are silently truncated when embedded), the share of tokens that
+are never embedded, and how full chunks are on average.
+
+Usage (from the repository root):
+    python benchmarks/bench_token_chunking.py [--pdf book.pdf ...] [--pages 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from config import CHUNK_OVERLAP, CHUNK_OVERLAP_TOKENS, CHUNK_SIZE  # noqa: E402
+from process_pdfs import extract_text_from_pdf, get_embedding_model, separators  # noqa: E402
+from splitter import RecursiveTextSplitter  # noqa: E402
+from synthetic_pdf import write_synthetic_pdf  # noqa: E402
+from token_splitter import TokenAwareTextSplitter  # noqa: E402
+
+
+def report(name: str, chunks: List[str], splitter: TokenAwareTextSplitter, limit: int, seconds: float) -> None:
+    lengths = splitter.count_tokens(chunks)
+    truncated = [length for length in lengths if length > limit]
+    total = sum(lengths)
+    lost = sum(length - limit for length in truncated)
+    print(
+        f"{name}: {len(chunks)} chunks in {seconds:.2f}s, {len(truncated)} truncated "
+        f"({len(truncated) / len(chunks):.1%}), {lost} of {total} tokens never embedded "
+        f"({lost / total:.1%}), mean {total / len(chunks):.0f} tokens per chunk "
+        f"({total / len(chunks) / limit:.0%} of the {limit}-token limit), max {max(lengths)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="*", help="PDFs to chunk (a synthetic one is generated if omitted)")
+    parser.add_argument("--pages", type=int, default=200, help="pages of the synthetic PDF")
+    args = parser.parse_args()
+
+    embedding_model = get_embedding_model()
+    limit = embedding_model.max_seq_length - embedding_model.special_tokens
+    token_splitter = TokenAwareTextSplitter(embedding_model.tokenizer, limit, CHUNK_OVERLAP_TOKENS, separators)
+    char_splitter = RecursiveTextSplitter(CHUNK_SIZE, CHUNK_OVERLAP, separators)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdfs = args.pdf or [write_synthetic_pdf(os.path.join(tmp, "synthetic.pdf"), args.pages, table_every=10)]
+        texts = [extract_text_from_pdf(pdf) for pdf in pdfs]
+
+    results = {}
+    for name, splitter in (
+        (f"characters {CHUNK_SIZE}/{CHUNK_OVERLAP}", char_splitter),
+        (f"tokens {limit}/{CHUNK_OVERLAP_TOKENS}", token_splitter)
+    ):
+        start = time.perf_counter()
+        chunks = [chunk for text in texts for chunk in splitter.split_text(text)]
+        results[name] = len(chunks)
+        report(name, chunks, token_splitter, limit, time.perf_counter() - start)
+
+    (char_name, char_count), (token_name, token_count) = results.items()
+    print(f"chunk count: {char_count} -> {token_count} ({token_count / char_count - 1:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
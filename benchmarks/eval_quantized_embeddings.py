@@ -0,0 +1,138 @@
+"""
+Evaluate the int8-quantized embedding model against float32 search.
+
+Embeds a corpus of chunks and a held-out query set (eval_queries.txt: rules
+questions not used to tune anything) with the float32 and the int8 variant of
+the same backend, searches the corpus exactly (brute-force cosine, so only the
+quantization differs) and reports, for each k, the mean overlap of the int8
+top-k with the float32 top-k and how often the float32 top hit is in the int8
+top-k. Also reports the same for int8 queries searched against the float32
+corpus, as happens if the query side is switched to int8 before the collection
+is re-ingested, how far the vectors moved and the speed of both variants, to
+decide whether EMBEDDING_QUANTIZATION = "int8" is worth it.
+
+The corpus is read from the ChromaDB collection, or generated with --synthetic
+(or if the collection is empty).
+
+Usage (from the repository root):
+    python benchmarks/eval_quantized_embeddings.py [--backend onnx] [--corpus 2000] [--k 1 3 5 10] [--synthetic]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from config import CHROMADB_PATH, CHUNK_OVERLAP, CHUNK_SIZE, DB_COLLECTION, EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME  # noqa: E402
+from embedding_backends import EmbeddingBackend, create_embedding_backend  # noqa: E402
+from splitter import RecursiveTextSplitter  # noqa: E402
+from synthetic_pdf import WORDS  # noqa: E402
+
+
+def synthetic_corpus(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    text = " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+        for _ in range(count * 12)
+    )
+    return RecursiveTextSplitter(CHUNK_SIZE, CHUNK_OVERLAP, ["\n\n", "\n", ".", " ", ""]).split_text(text)[:count]
+
+
+def load_corpus(count: int, synthetic: bool) -> List[str]:
+    if not synthetic:
+        import chromadb
+
+        collection = chromadb.PersistentClient(path=CHROMADB_PATH).get_or_create_collection(DB_COLLECTION)
+        documents = collection.get(limit=count, include=["documents"])["documents"]
+        if documents:
+            return documents
+        print("The collection is empty: using a synthetic corpus.")
+    return synthetic_corpus(count)
+
+
+def embed(backend: EmbeddingBackend, corpus: List[str], queries: List[str]) -> Tuple[np.ndarray, np.ndarray, float, float]:
+    """
+    Embed the corpus in bulk and the queries one at a time, as at /search. Returns the
+    vectors, the corpus throughput in chunks per second and the median query latency.
+    """
+    start = time.perf_counter()
+    corpus_vectors = backend.encode(corpus)
+    chunks_per_second = len(corpus) / (time.perf_counter() - start)
+
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(backend.encode([query])[0])
+        latencies.append(time.perf_counter() - start)
+    return corpus_vectors, np.array(query_vectors), chunks_per_second, statistics.median(latencies)
+
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(corpus_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    scores = normalized(query_vectors) @ normalized(corpus_vectors).T
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, help="embedding backend")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="embedding model")
+    parser.add_argument("--corpus", type=int, default=2000, help="chunks to search")
+    parser.add_argument("--queries", default=os.path.join(BENCH_DIR, "eval_queries.txt"), help="query file, one per line")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10], help="top-k cut-offs")
+    parser.add_argument("--synthetic", action="store_true", help="search a synthetic corpus instead of the collection")
+    args = parser.parse_args()
+
+    with open(args.queries, "r") as f:
+        queries = [line.strip() for line in f if line.strip()]
+    corpus = load_corpus(args.corpus, args.synthetic)
+    print(f"{len(corpus)} chunks, {len(queries)} held-out queries, {args.backend} backend")
+
+    results = {}
+    for quantization in (None, "int8"):
+        backend = create_embedding_backend(args.backend, args.model, quantization)
+        backend.encode(queries[:5])  # warm-up
+        results[quantization] = embed(backend, corpus, queries)
+        corpus_vectors, query_vectors, chunks_per_second, latency = results[quantization]
+        print(
+            f"{quantization or 'float32'}: {chunks_per_second:.1f} chunks/s, "
+            f"query latency p50 {latency * 1000:.1f} ms"
+        )
+
+    reference_corpus, reference_queries = results[None][:2]
+    int8_corpus, int8_queries = results["int8"][:2]
+    drift = 1 - (normalized(reference_corpus) * normalized(int8_corpus)).sum(axis=1)
+    print(f"corpus vector cosine distance float32 vs int8: mean {drift.mean():.2e}, max {drift.max():.2e}")
+    print(f"speedup: {results['int8'][2] / results[None][2]:.2f}x bulk, {results[None][3] / results['int8'][3]:.2f}x query")
+
+    configurations = {
+        "int8": (int8_corpus, int8_queries),
+        "int8 queries vs float32 chunks": (reference_corpus, int8_queries),
+    }
+    for k in args.k:
+        k = min(k, len(corpus))
+        reference = top_k(reference_corpus, reference_queries, k)
+        for name, (corpus_vectors, query_vectors) in configurations.items():
+            quantized = top_k(corpus_vectors, query_vectors, k)
+            overlap = [len(set(a) & set(b)) / k for a, b in zip(reference, quantized)]
+            top_hit = [a[0] in b for a, b in zip(reference, quantized)]
+            identical = [list(a) == list(b) for a, b in zip(reference, quantized)]
+            print(
+                f"top-{k} {name}: overlap {np.mean(overlap):.1%} (min {min(overlap):.0%}), "
+                f"float32 top hit in top-{k} {np.mean(top_hit):.1%}, identical ranking {np.mean(identical):.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Write synthetic multi-page PDFs for the benchmarks without extra dependencies.
+"""
+import random
+from typing import Dict, List, Optional
+
+WORDS = (
+    "attack roll damage dice saving throw spell slot hit points armor class initiative "
+    "advantage disadvantage proficiency bonus creature target range weapon action reaction "
+    "bonus concentration condition grappled prone stunned rest level class ability check"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_stream(rng: random.Random, page_number: int, lines_per_page: int, with_table: bool) -> bytes:
+    ops: List[str] = ["BT", "/F1 10 Tf", "12 TL", "50 760 Td", f"(Chapter {page_number // 20 + 1}) Tj", "T*"]
+    # Leave the lower half of the page free for the table
+    prose_lines = min(lines_per_page, 25) if with_table else lines_per_page
+    for _ in range(prose_lines):
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14)))
+        ops.append(f"({_escape(line.capitalize())}.) Tj T*")
+    ops.append("ET")
+
+    if with_table:
+        # A 3x4 ruled table below the prose
+        top, row_height, col_width = 400, 20, 150
+        for row in range(4):
+            for col in range(3):
+                x, y = 50 + col * col_width, top - (row + 1) * row_height
+                ops.append(f"{x} {y} {col_width} {row_height} re S")
+                ops.append(f"BT /F1 9 Tf {x + 4} {y + 6} Td ({_escape(rng.choice(WORDS))} {row}{col}) Tj ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def write_synthetic_pdf(
+    path: str,
+    pages: int,
+    lines_per_page: int = 50,
+    table_every: int = 0,
+    seed: int = 0,
+    edited_pages: Optional[Dict[int, int]] = None,
+    forms: bool = False
+) -> str:
+    """
+    Write a PDF with `pages` pages of random rulebook-like prose.
+    Every `table_every`-th page (0 disables) also gets a ruled table.
+    Pages in `edited_pages` (page number -> line count) get new prose of that many lines;
+    every other page is the same as without them.
+    With `forms`, each page's content is drawn through a Form XObject, so the content
+    streams of the pages themselves are all the same.
+    """
+    edited_pages = edited_pages or {}
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")  # filled in once the page tree id is known
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for number in range(1, pages + 1):
+        with_table = bool(table_every) and number % table_every == 0
+        stream = _page_stream(rng, number, lines_per_page, with_table)
+        if number in edited_pages:
+            stream = _page_stream(random.Random(f"{seed}/{number}"), number, edited_pages[number], with_table)
+        resources = b"/Font << /F1 %d 0 R >>" % font_id
+        if forms:
+            form_id = add(
+                b"<< /Type /XObject /Subtype /Form /BBox [0 0 612 792] /Resources << %s >> /Length %d >>\n"
+                b"stream\n%s\nendstream" % (resources, len(stream), stream)
+            )
+            resources += b" /XObject << /Fm1 %d 0 R >>" % form_id
+            stream = b"/Fm1 Do"
+        content_id = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << %s >> /Contents %d 0 R >>" % (pages_id, resources, content_id)
+        ))
+
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref_at = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(objects) + 1, catalog_id, xref_at
+        ))
+    return path
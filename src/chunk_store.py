@@ -0,0 +1,343 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from near_duplicates import NearDuplicateIndex, same_text
+
+if TYPE_CHECKING:
+    import chromadb
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Ids are looked up in slices of this many, to stay well within SQLite's variable limit
+GET_BATCH_SIZE = 5000
+
+KEY_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Where a chunk occurs: {"source", "chunk_index", "page_start", "page_end", "start_offset", "end_offset"}
+Occurrence = Dict[str, Any]
+
+
+def chunk_key(text: str) -> str:
+    """
+    Content hash of a chunk's text, used as its id in the collection.
+    """
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def is_chunk_key(chunk_id: str) -> bool:
+    """
+    Check whether an id in the collection is a chunk key, rather than an id of the
+    per-file "<file>_p<page>_c<k>" scheme used before chunks were deduplicated.
+    """
+    return KEY_PATTERN.fullmatch(chunk_id) is not None
+
+
+def occurrence_order(occurrence: Occurrence) -> Tuple[str, int]:
+    return occurrence["source"], occurrence["chunk_index"]
+
+
+class ChunkStore:
+    """
+    Deduplicated chunk storage on top of a ChromaDB collection.
+
+    Chunks are stored under the content hash of their text, so text that several PDFs
+    share (or that one PDF repeats) is embedded and stored once. Each stored chunk lists
+    every place it occurs in its "occurrences" metadata, a JSON list of occurrences
+    (Chroma metadata values must be scalars), and its other metadata is that of its first
+    occurrence, so filters and citations on source and page keep working.
+
+    With a near-duplicate index, a new chunk whose text is nearly identical to a stored
+    chunk's and differs from it only in whitespace, punctuation, hyphenation or a page header
+    (see same_text) is not stored either: it becomes an occurrence of that chunk, which
+    represents its whole cluster. Chunks differing in any other word are kept apart.
+
+    Occurrences are identified by (source, chunk_index): adding one again replaces it, and
+    set_source replaces all occurrences of a source in the given chunks, so every update
+    is idempotent. A chunk is deleted once its last occurrence is removed.
+
+    Given the embedding variant of the embeddings it is passed (see
+    embedding_backends.cache_name), the store records it in the "embedding" metadata of
+    every vector it writes. Adding text that is stored with a vector of another variant
+    (or of an unrecorded one) replaces that vector, and such chunks are never used as
+    near-duplicates, so after a change of model or quantization re-ingesting the files
+    replaces every vector instead of mixing variants in one collection.
+
+    Updating occurrences reads a chunk's metadata and writes it back, so with a lock file
+    every update (and the near-duplicate index writes it makes) runs under an exclusive
+    lock on it, and several ingestion processes can share the store without losing each
+    other's occurrences.
+    """
+
+    def __init__(
+        self,
+        collection: "chromadb.Collection",
+        dimension: int,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+        lock_path: Optional[str] = None,
+        embedding: Optional[str] = None
+    ) -> None:
+        self.collection = collection
+        self.dimension = dimension
+        self.near_duplicates = near_duplicates
+        self.lock_path = lock_path
+        if lock_path is not None:
+            os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        self.embedding = embedding
+
+        self.stored = 0
+        self.reembedded = 0
+        self.duplicates = 0
+        self.near_duplicate_count = 0
+        self.duplicate_text_bytes = 0
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        if self.lock_path is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self, keys: List[str]) -> Tuple[Dict[str, List[Occurrence]], Dict[str, Optional[str]]]:
+        """
+        Read the occurrences and the embedding variant of the stored chunks among keys.
+        """
+        occurrences: Dict[str, List[Occurrence]] = {}
+        embeddings: Dict[str, Optional[str]] = {}
+        for i in range(0, len(keys), GET_BATCH_SIZE):
+            result = self.collection.get(ids=keys[i:i + GET_BATCH_SIZE], include=["metadatas"])
+            for key, metadata in zip(result["ids"], result["metadatas"]):
+                occurrences[key] = json.loads(metadata.get("occurrences", "[]"))
+                embeddings[key] = metadata.get("embedding")
+        return occurrences, embeddings
+
+    def _get(self, keys: List[str]) -> Dict[str, List[Occurrence]]:
+        """
+        Read the occurrences of the stored chunks among keys.
+        """
+        return self._read(keys)[0]
+
+    def _is_stale(self, embedding: Optional[str]) -> bool:
+        """
+        Check whether a vector of the given embedding variant is not one this store writes.
+        """
+        return self.embedding is not None and embedding != self.embedding
+
+    def _metadata(self, occurrences: List[Occurrence], embedded: bool = False) -> Dict[str, Any]:
+        """
+        Metadata of a chunk with these occurrences. Only writes of the chunk's vector pass
+        embedded, which records the store's embedding variant; updates keep the stored one.
+        """
+        occurrences.sort(key=occurrence_order)
+        metadata = {
+            **occurrences[0],
+            "occurrences": json.dumps(occurrences, separators=(",", ":")),
+            "occurrence_count": len(occurrences)
+        }
+        if embedded and self.embedding is not None:
+            metadata["embedding"] = self.embedding
+        return metadata
+
+    def _find_near_duplicate(
+        self,
+        key: str,
+        text: str,
+        stored: Dict[str, List[Occurrence]],
+        new: Dict[str, Tuple[str, Any, List[Occurrence]]]
+    ) -> Optional[str]:
+        """
+        Find the stored (or just added) chunk most similar to a new chunk's text that says the
+        same thing and has a vector of the current embedding variant, loading its occurrences
+        into stored. Without one, the new chunk is indexed under key.
+        """
+        if self.near_duplicates is None:
+            return None
+        signature = self.near_duplicates.signature(text)
+        if signature is None:
+            self.near_duplicates.add([(key, None)])
+            return None
+
+        for candidate, _ in self.near_duplicates.query(signature):
+            if candidate in new:
+                if same_text(text, new[candidate][0]):
+                    return candidate
+                continue
+
+            result = self.collection.get(ids=[candidate], include=["documents", "metadatas"])
+            if not result["ids"]:
+                # Indexed, but its chunk was never stored or has been deleted
+                self.near_duplicates.remove([candidate])
+                continue
+            metadata = result["metadatas"][0]
+            if self._is_stale(metadata.get("embedding")) or not same_text(text, result["documents"][0]):
+                continue
+            # Occurrences already loaded may have been changed by this batch
+            stored.setdefault(candidate, json.loads(metadata.get("occurrences", "[]")))
+            return candidate
+        self.near_duplicates.add([(key, signature)])
+        return None
+
+    def add(self, chunks: List[Tuple[str, Any, Occurrence]]) -> List[str]:
+        """
+        Store (text, embedding, occurrence) entries and return the key each one is stored under.
+        Text that is already stored, or nearly identical to a stored chunk's, only adds the
+        occurrence to that chunk; the embedding of a new chunk is stored once however often
+        it repeats. Stored text whose vector is of another embedding variant gets the new
+        embedding in its place.
+        """
+        with self._locked():
+            keys = [chunk_key(text) for text, _, _ in chunks]
+            stored, embeddings = self._read(sorted(set(keys)))
+            new: Dict[str, Tuple[str, Any, List[Occurrence]]] = {}
+            reembed: Dict[str, Tuple[str, Any]] = {}
+            stored_keys = []
+
+            for key, (text, embedding, occurrence) in zip(keys, chunks):
+                if key in stored and key not in reembed and self._is_stale(embeddings[key]):
+                    reembed[key] = (text, embedding)
+                near_duplicate = False
+                if key not in stored and key not in new:
+                    representative = self._find_near_duplicate(key, text, stored, new)
+                    if representative is None:
+                        new[key] = (text, embedding, [occurrence])
+                        stored_keys.append(key)
+                        continue
+                    key = representative
+                    near_duplicate = True
+
+                occurrences = stored[key] if key in stored else new[key][2]
+                # Only text another file has counts as a duplicate, not a file's own
+                # chunk added again when it is re-ingested or repeated within it
+                if any(o["source"] != occurrence["source"] for o in occurrences):
+                    self.duplicates += 1
+                    self.near_duplicate_count += near_duplicate
+                    self.duplicate_text_bytes += len(text.encode())
+                occurrences[:] = [o for o in occurrences if occurrence_order(o) != occurrence_order(occurrence)]
+                occurrences.append(occurrence)
+                stored_keys.append(key)
+
+            if new:
+                self.collection.upsert(
+                    ids=list(new),
+                    documents=[text for text, _, _ in new.values()],
+                    embeddings=[embedding for _, embedding, _ in new.values()],
+                    metadatas=[self._metadata(occurrences, embedded=True) for _, _, occurrences in new.values()]
+                )
+                self.stored += len(new)
+            if reembed:
+                self.collection.upsert(
+                    ids=list(reembed),
+                    documents=[text for text, _ in reembed.values()],
+                    embeddings=[embedding for _, embedding in reembed.values()],
+                    metadatas=[self._metadata(stored[key], embedded=True) for key in reembed]
+                )
+                self.reembedded += len(reembed)
+            updated = {key: occurrences for key, occurrences in stored.items() if key not in reembed}
+            if updated:
+                self.collection.update(
+                    ids=list(updated),
+                    metadatas=[self._metadata(occurrences) for occurrences in updated.values()]
+                )
+            if self.near_duplicates is not None:
+                self.near_duplicates.commit()
+            return stored_keys
+
+    def set_source(self, source: str, keys: Iterable[str], occurrences: Dict[str, List[Occurrence]]) -> int:
+        """
+        Make occurrences[key] (none if missing) the only occurrences of source in each of
+        the stored chunks among keys, deleting chunks left without any occurrence.
+        Returns the number of chunks deleted.
+        """
+        with self._locked():
+            stored = self._get(sorted(set(keys)))
+            orphaned = []
+            updated = {}
+            for key, current in stored.items():
+                remaining = [o for o in current if o["source"] != source] + occurrences.get(key, [])
+                if not remaining:
+                    orphaned.append(key)
+                elif sorted(remaining, key=occurrence_order) != sorted(current, key=occurrence_order):
+                    updated[key] = remaining
+
+            if orphaned:
+                self.collection.delete(ids=orphaned)
+                if self.near_duplicates is not None:
+                    self.near_duplicates.remove(orphaned)
+                    self.near_duplicates.commit()
+            if updated:
+                self.collection.update(
+                    ids=list(updated),
+                    metadatas=[self._metadata(remaining) for remaining in updated.values()]
+                )
+            return len(orphaned)
+
+    def remove_legacy(self, source: str) -> int:
+        """
+        Delete the chunks a source was stored as before chunks were deduplicated.
+        Returns the number of chunks deleted.
+        """
+        with self._locked():
+            ids = self.collection.get(where={"source": source}, include=[])["ids"]
+            legacy = [chunk_id for chunk_id in ids if not is_chunk_key(chunk_id)]
+            if legacy:
+                self.collection.delete(ids=legacy)
+                if self.near_duplicates is not None:
+                    self.near_duplicates.remove(legacy)
+                    self.near_duplicates.commit()
+            return len(legacy)
+
+    def index_near_duplicates(self) -> None:
+        """
+        Add the stored chunks missing from the near-duplicate index, e.g. chunks stored before
+        near-duplicate detection was turned on or after the index was cleared. Chunks without
+        words and chunks stored before deduplication are recorded without a signature, so the
+        index holds an entry for every stored chunk and the next run finds nothing to add.
+        """
+        if self.near_duplicates is None:
+            return
+        with self._locked():
+            count = self.collection.count()
+            if self.near_duplicates.count() >= count:
+                return
+
+            indexed = set(self.near_duplicates.keys())
+            added = 0
+            for offset in range(0, count, GET_BATCH_SIZE):
+                result = self.collection.get(limit=GET_BATCH_SIZE, offset=offset, include=["documents"])
+                entries = []
+                for key, document in zip(result["ids"], result["documents"]):
+                    if key not in indexed:
+                        entries.append((key, self.near_duplicates.signature(document) if is_chunk_key(key) else None))
+                self.near_duplicates.add(entries)
+                added += len(entries)
+            self.near_duplicates.commit()
+            logging.info(f"Added {added} stored chunks to the near-duplicate index.")
+
+    def report(self, occurrences: int) -> str:
+        """
+        Summarise the duplicates of other files' chunks skipped in this run and the storage
+        saved by deduplication across the collection, given the number of chunk occurrences
+        of all ingested files.
+        """
+        vectors = self.collection.count()
+        saved = max(0, occurrences - vectors)
+        vector_bytes = self.dimension * 4
+        return (
+            f"Chunk dedup: {self.stored} new chunks stored and {self.duplicates} duplicates "
+            f"({self.near_duplicate_count} of them near-duplicates, {self.duplicate_text_bytes / 1024 / 1024:.1f} MB "
+            f"of text) linked to other files' chunks in this run, {self.reembedded} stored chunks given a new vector. "
+            f"{vectors} chunks stored for {occurrences} occurrences: {saved} vectors "
+            f"({saved / max(occurrences, 1):.1%}, {saved * vector_bytes / 1024 / 1024:.1f} MB of float32 embeddings) saved."
+        )
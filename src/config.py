@@ -2,19 +2,103 @@ import os
 
 # Define constants for Llama.cpp
 LLAMA_BINARY = "/home/oluf/llama.cpp/build/bin/llama-run"
+LLAMA_SERVER_BINARY = "/home/oluf/llama.cpp/build/bin/llama-server"
 MODEL_FILE = "/home/oluf/projects/ai-gm-pipeline/models/mythomax-13B.Q4_K_M.gguf"
 
 GPU_LAYERS = "35"
 TEMPERATURE = "0.7"
 TIMEOUT = 30
 
+# "server" keeps the model resident in a supervised llama-server process,
+# "subprocess" spawns llama-run (and reloads the model) for every request.
+LLM_BACKEND = "server"
+LLAMA_SERVER_HOST = "127.0.0.1"
+LLAMA_SERVER_PORT = 8081
+LLAMA_SERVER_CONTEXT_SIZE = 4096
+LLAMA_SERVER_POOL_SIZE = 4
+LLAMA_SERVER_STARTUP_TIMEOUT = 180
+LLAMA_SERVER_REQUEST_TIMEOUT = 300
+# Cap on the tokens llama-server generates per answer; None lets it answer in full,
+# as llama-run does
+MAX_TOKENS = None
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CHROMADB_PATH = os.path.join(BASE_DIR, "../data/rpg_sources_db")
+MANIFEST_PATH = os.path.join(BASE_DIR, "../data/manifest.sqlite3")
+# JSON manifest of older versions, imported into MANIFEST_PATH the first time it is opened
 HASH_FILE_PATH = os.path.join(BASE_DIR, "../data/processed_files.json")
 PDF_STORE = os.path.join(BASE_DIR, "../data/pdfs")
+EMBEDDING_CACHE_PATH = os.path.join(BASE_DIR, "../data/embedding_cache")
+PAGE_CACHE_PATH = os.path.join(BASE_DIR, "../data/page_cache")
+NEAR_DUPLICATE_INDEX_PATH = os.path.join(BASE_DIR, "../data/near_duplicates.sqlite3")
+# Lock file serializing the chunk store updates of concurrent ingestion runs
+CHUNK_STORE_LOCK_PATH = os.path.join(BASE_DIR, "../data/chunk_store.lock")
+LLAMA_SERVER_LOG = os.path.join(BASE_DIR, "../data/llama-server.log")
 DB_COLLECTION = "rpg_sources"
 
 CHUNK_SIZE = 768
 CHUNK_OVERLAP = 100
+# Chunk length is measured in "tokens" of the embedding model, packing chunks up to its max
+# sequence length so no text is truncated when embedded, or in "characters" (CHUNK_SIZE).
+# Changing the chunk settings takes effect for already ingested files with --rebuild-from-cache.
+CHUNK_LENGTH_UNIT = "tokens"
+CHUNK_OVERLAP_TOKENS = 24
+# A new chunk whose estimated Jaccard similarity (over word 3-grams, ignoring case, whitespace,
+# punctuation and hyphenation) with a stored chunk reaches this threshold, and whose words
+# differ from that chunk's only by a page header or footer, is stored as an occurrence of it
+# instead of getting a vector of its own; None turns this off. Chunks differing in any other
+# word (a number in a rule, say) are kept apart however similar they are. Applies to chunks
+# ingested after a change (--rebuild-from-cache to redo).
+NEAR_DUPLICATE_THRESHOLD = 0.95
+MINHASH_PERMUTATIONS = 128
+# Chunks are handed to the embedding model in groups of this size, which it sorts by token
+# length into batches of similar lengths (results are put back in order), so short table
+# fragments are not padded to the length of full prose chunks
+EMBED_BATCH_SIZE = 256
+# A batch holds at most this many tokens, padding included, or fewer if the encoder's
+# activations for it would take more than EMBED_MEMORY_FRACTION of the available memory.
+# On CPUs larger batches are no faster (about ten full-length chunks already fill the cores).
+EMBED_MAX_BATCH_TOKENS = 4096
+EMBED_MEMORY_FRACTION = 0.25
+# Embedded batches are coalesced into ChromaDB writes of at least this many chunks
+WRITE_BATCH_SIZE = 512
+# Capacity of each queue between ingestion pipeline stages, and how often their progress is logged (seconds)
+PIPELINE_QUEUE_SIZE = 32
+PIPELINE_LOG_INTERVAL = 10
+# In watch mode a new or modified PDF is ingested once its size and mtime
+# have not changed for this many seconds (so half-copied files are skipped)
+WATCH_SETTLE_SECONDS = 2.0
+# Extraction/chunking worker processes for parallel ingestion. One core is left
+# for the main process, which embeds the chunks and owns the ChromaDB collection.
+INGEST_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+# PDF text extractor: "pdfplumber" runs layout analysis on every page, "pdfium" extracts
+# prose pages with PDFium (much faster) and only hands possible table pages to pdfplumber.
+# A changed extractor applies to files ingested or changed after the switch.
+PDF_EXTRACTOR = "pdfium"
+# Pages with at least this many vector path objects (table rules and cell boxes) may hold
+# a table. One path can draw a whole ruled grid, so anything above 1 may miss tables.
+PDFIUM_TABLE_MIN_PATHS = 1
+# Every n-th page on which the table pre-check skips extract_tables is still run through it,
+# to measure the time saved (0 disables the sampling)
+TABLE_CHECK_SAMPLE_EVERY = 50
+# Large PDFs are extracted as page-range shards of this many pages in parallel
+PAGE_SHARD_SIZE = 25
+# Changed PDFs are re-ingested page by page unless more than this fraction of pages changed
+INCREMENTAL_MAX_CHANGED_PAGES = 0.25
 EMBEDDING_MODEL_NAME = 'all-MPNET-base-v2'
-DEFAULT_N_RESULTS = 3
\ No newline at end of file
+# Embedding backend: "sentence-transformers" runs the model with torch, "onnx" runs its ONNX
+# export with ONNX Runtime, which is faster on CPU-only machines and does not load torch.
+# Both give the same vectors to within PARITY_TOLERANCE (benchmarks/bench_embedding_backends.py
+# checks this), so switching needs no re-ingest and both share the embedding cache.
+EMBEDDING_BACKEND = "sentence-transformers"
+# "int8" embeds with a dynamically quantized model (int8 weights in its linear layers):
+# quantized when loaded for "sentence-transformers", the export's pre-quantized
+# EMBEDDING_ONNX_INT8_FILE for "onnx". Faster on CPUs, at the cost of slightly different vectors;
+# benchmarks/eval_quantized_embeddings.py measures the top-k overlap with float32 search.
+# None embeds in float32. Applies to ingestion and search alike, and queries must be embedded
+# like the chunks they are compared with: after a change, the next ingestion run re-ingests
+# every file and replaces the stored vectors (search mixes variants until it has finished).
+# Each variant has its own embedding cache.
+EMBEDDING_QUANTIZATION = None
+EMBEDDING_ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+DEFAULT_N_RESULTS = 3
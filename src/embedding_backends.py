@@ -0,0 +1,344 @@
+import json
+import logging
+import os
+from typing import Callable, List, Optional, Union
+
+import numpy as np
+from tokenizers import Encoding, Tokenizer
+
+from config import (
+    EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_INT8_FILE, EMBEDDING_QUANTIZATION,
+    EMBED_MAX_BATCH_TOKENS, EMBED_MEMORY_FRACTION
+)
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Largest cosine distance allowed between the vectors two backends give the same text, so
+# either can embed queries against chunks the other stored (and share the embedding cache)
+PARITY_TOLERANCE = 1e-4
+
+# Float32 values the encoder holds per padded token at its peak, per unit of hidden size: the
+# layer input and output, the attention projections and the 4x wider feed-forward activations
+ACTIVATIONS_PER_TOKEN = 16
+
+# Texts per batch both backends embedded in before batches were length-bucketed
+PREVIOUS_BATCH_SIZE = 32
+
+
+def model_file(model_name: str, filename: str) -> str:
+    """
+    Path of one of a sentence-transformers model's files: in the model's directory if
+    model_name is one, otherwise downloaded from (or found in the cache of) the Hugging
+    Face Hub, where bare model names live under "sentence-transformers/".
+    """
+    if os.path.isdir(model_name):
+        return os.path.join(model_name, filename)
+    from huggingface_hub import hf_hub_download
+
+    repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    return hf_hub_download(repo_id, filename)
+
+
+def read_json(model_name: str, filename: str) -> dict:
+    with open(model_file(model_name, filename), "r") as f:
+        return json.load(f)
+
+
+def cache_name(model_name: str, backend: str, quantization: Optional[str]) -> str:
+    """
+    The name a model variant's embeddings are cached under. Float32 vectors are shared by the
+    backends, which agree to within PARITY_TOLERANCE; quantized ones differ between them.
+    """
+    if quantization is None:
+        return model_name
+    return f"{model_name}.{quantization}-{backend}"
+
+
+def available_memory() -> Optional[int]:
+    """
+    MemAvailable in bytes, or None where /proc/meminfo cannot be read.
+    """
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def batch_token_budget(hidden_size: int, max_seq_length: int) -> int:
+    """
+    How many tokens, padding included, a batch may hold: EMBED_MAX_BATCH_TOKENS, or fewer if
+    the encoder's activations for the batch would take more than EMBED_MEMORY_FRACTION of the
+    memory available right now. Always at least one sequence of max_seq_length.
+    """
+    budget = EMBED_MAX_BATCH_TOKENS
+    memory = available_memory()
+    if memory is not None:
+        # Attention scores: a row of max_seq_length per token and head (of 64 dimensions)
+        bytes_per_token = 4 * (ACTIVATIONS_PER_TOKEN * hidden_size + max(1, hidden_size // 64) * max_seq_length)
+        budget = min(budget, int(memory * EMBED_MEMORY_FRACTION) // bytes_per_token)
+    return max(budget, max_seq_length)
+
+
+def plan_batches(lengths: List[int], max_tokens: int) -> List[List[int]]:
+    """
+    Group the indices of texts of the given token lengths into batches of similar lengths:
+    sorted by length, each batch is filled while its size times its longest length (the
+    padded tokens the encoder processes) stays within max_tokens.
+    """
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        # Sorted shortest first, so text i is the longest of its batch
+        if batch and (len(batch) + 1) * lengths[i] > max_tokens:
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def fixed_batches(order: List[int], size: int = PREVIOUS_BATCH_SIZE) -> List[List[int]]:
+    """
+    Split text indices, in the given order, into batches of size texts.
+    """
+    return [order[i:i + size] for i in range(0, len(order), size)]
+
+
+def padded_tokens(lengths: List[int], batches: List[List[int]]) -> int:
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+
+
+class PaddingStats:
+    """
+    Counts the tokens embedded and the padded tokens the encoder processed for them, with
+    length-bucketed batches and with the batches the backend used before (described by
+    previous), so the saving is measured against what actually ran.
+    """
+
+    def __init__(self, previous: str) -> None:
+        self.previous = previous
+        self.tokens = 0
+        self.padded = 0
+        self.previous_padded = 0
+
+    def add(self, lengths: List[int], batches: List[List[int]], previous_batches: List[List[int]]) -> None:
+        self.tokens += sum(lengths)
+        self.padded += padded_tokens(lengths, batches)
+        self.previous_padded += padded_tokens(lengths, previous_batches)
+
+    @staticmethod
+    def ratio(tokens: int, padded: int) -> float:
+        return 1 - tokens / padded if padded else 0.0
+
+    def report(self) -> str:
+        return (
+            f"Embedding padding: {self.ratio(self.tokens, self.previous_padded):.1%} of encoder tokens "
+            f"in {self.previous}, {self.ratio(self.tokens, self.padded):.1%} length-bucketed "
+            f"({self.tokens} tokens, {self.padded} padded, {self.previous_padded} before)."
+        )
+
+
+def encode_bucketed(
+    lengths: List[int],
+    encode_batch: Callable[[List[int]], np.ndarray],
+    dimension: int,
+    max_tokens: int,
+    padding: PaddingStats,
+    previous_batches: List[List[int]]
+) -> np.ndarray:
+    """
+    Embed texts of the given token lengths in length-bucketed batches, encode_batch embedding
+    the texts at a list of indices, and return the vectors in the texts' original order.
+    previous_batches are the batches the backend would have used before, for the padding stats.
+    """
+    batches = plan_batches(lengths, max_tokens)
+    padding.add(lengths, batches, previous_batches)
+    embeddings = np.empty((len(lengths), dimension), dtype=np.float32)
+    for batch in batches:
+        embeddings[batch] = encode_batch(batch)
+    return embeddings
+
+
+class SentenceTransformerBackend:
+    """
+    Runs the embedding model with sentence-transformers on torch. With int8 quantization
+    the weights of its linear layers are quantized when it is loaded (on the CPU).
+    """
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, quantization: Optional[str] = None) -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.quantization = quantization
+        self.cache_name = cache_name(model_name, self.name, quantization)
+        if quantization == "int8":
+            import torch
+            from torch.ao.quantization import quantize_dynamic
+
+            self.model = quantize_dynamic(SentenceTransformer(model_name, device="cpu"), {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.max_seq_length = self.model.max_seq_length
+        self.tokenizer: Tokenizer = self.model.tokenizer.backend_tokenizer
+        self.special_tokens = self.model.tokenizer.num_special_tokens_to_add()
+        # Counts tokens the way the model truncates them
+        self.counter = Tokenizer.from_str(self.tokenizer.to_str())
+        self.counter.enable_truncation(self.max_seq_length)
+        self.counter.no_padding()
+        self.padding = PaddingStats(f"batches of {PREVIOUS_BATCH_SIZE} sorted by character length")
+
+    @staticmethod
+    def previous_batches(texts: List[str]) -> List[List[int]]:
+        """
+        The batches SentenceTransformer.encode makes of texts with batch_size=PREVIOUS_BATCH_SIZE,
+        as this backend embedded them before: longest first by character count.
+        """
+        return fixed_batches(np.argsort([-len(text) for text in texts]).tolist())
+
+    def encode(self, texts: List[str], max_batch_tokens: Optional[int] = None) -> np.ndarray:
+        """
+        Embed texts into a (len(texts), dimension) float32 array, in length-bucketed batches.
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        lengths = [len(encoding.ids) for encoding in self.counter.encode_batch_fast([text.strip() for text in texts])]
+
+        def encode_batch(batch: List[int]) -> np.ndarray:
+            return self.model.encode(
+                [texts[i] for i in batch], batch_size=len(batch), convert_to_numpy=True, show_progress_bar=False
+            )
+
+        return encode_bucketed(
+            lengths, encode_batch, self.dimension,
+            max_batch_tokens or batch_token_budget(self.dimension, self.max_seq_length), self.padding,
+            self.previous_batches(texts)
+        )
+
+
+class OnnxBackend:
+    """
+    Runs the ONNX export of a sentence-transformers model with ONNX Runtime on the CPU,
+    without torch.
+
+    The transformer is the model's "onnx/model.onnx", or with int8 quantization its
+    dynamically quantized export EMBEDDING_ONNX_INT8_FILE; tokenization (with the model's
+    truncation to max_seq_length), pooling and normalization are done here the way the
+    model's sentence-transformers modules do them, so its vectors match the
+    sentence-transformers backend's to within float32 rounding.
+    """
+    name = "onnx"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, quantization: Optional[str] = None) -> None:
+        import onnxruntime
+
+        self.model_name = model_name
+        self.quantization = quantization
+        self.cache_name = cache_name(model_name, self.name, quantization)
+        onnx_file = EMBEDDING_ONNX_INT8_FILE if quantization == "int8" else "onnx/model.onnx"
+        settings = read_json(model_name, "sentence_bert_config.json")
+        self.max_seq_length = settings["max_seq_length"]
+        self.lowercase = settings.get("do_lower_case", False)
+        modules = [module["type"] for module in read_json(model_name, "modules.json")]
+        self.normalize = any(module.endswith(".Normalize") for module in modules)
+        pooling = read_json(model_name, "1_Pooling/config.json")
+        if pooling.get("pooling_mode_mean_tokens"):
+            self.pooling = "mean"
+        elif pooling.get("pooling_mode_cls_token"):
+            self.pooling = "cls"
+        else:
+            raise ValueError(f"Unsupported pooling of {model_name}: {pooling}")
+        self.dimension = pooling["word_embedding_dimension"]
+
+        self.tokenizer = Tokenizer.from_file(model_file(model_name, "tokenizer.json"))
+        self.special_tokens = len(self.tokenizer.encode("", add_special_tokens=True).ids)
+        pad_token = read_json(model_name, "tokenizer_config.json").get("pad_token")
+        self.pad_id = self.tokenizer.token_to_id(pad_token) if isinstance(pad_token, str) else 0
+        self.encoder = Tokenizer.from_str(self.tokenizer.to_str())
+        self.encoder.enable_truncation(self.max_seq_length)
+        self.encoder.no_padding()
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            model_file(model_name, onnx_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.output_name = self.session.get_outputs()[0].name
+        self.padding = PaddingStats(f"batches of {PREVIOUS_BATCH_SIZE} in document order")
+
+    @staticmethod
+    def previous_batches(texts: List[str]) -> List[List[int]]:
+        """
+        The batches this backend embedded texts in before: PREVIOUS_BATCH_SIZE at a time, in order.
+        """
+        return fixed_batches(list(range(len(texts))))
+
+    def _encode_batch(self, encodings: List[Encoding]) -> np.ndarray:
+        length = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.full((len(encodings), length), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), length), dtype=np.int64)
+        for i, encoding in enumerate(encodings):
+            input_ids[i, :len(encoding.ids)] = encoding.ids
+            attention_mask[i, :len(encoding.ids)] = 1
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run([self.output_name], inputs)[0]
+
+        if self.pooling == "cls":
+            embeddings = token_embeddings[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings.astype(np.float32)
+
+    def encode(self, texts: List[str], max_batch_tokens: Optional[int] = None) -> np.ndarray:
+        """
+        Embed texts into a (len(texts), dimension) float32 array, in length-bucketed batches.
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        # Stripped (and lowercased) like sentence-transformers does before tokenizing
+        texts = [text.strip().lower() if self.lowercase else text.strip() for text in texts]
+        encodings = self.encoder.encode_batch_fast(texts)
+        return encode_bucketed(
+            [len(encoding.ids) for encoding in encodings],
+            lambda batch: self._encode_batch([encodings[i] for i in batch]),
+            self.dimension,
+            max_batch_tokens or batch_token_budget(self.dimension, self.max_seq_length),
+            self.padding,
+            self.previous_batches(texts)
+        )
+
+
+EmbeddingBackend = Union[SentenceTransformerBackend, OnnxBackend]
+
+
+def create_embedding_backend(
+    name: str = EMBEDDING_BACKEND,
+    model_name: str = EMBEDDING_MODEL_NAME,
+    quantization: Optional[str] = EMBEDDING_QUANTIZATION
+) -> EmbeddingBackend:
+    """
+    Create the configured embedding backend.
+    """
+    if quantization not in (None, "int8"):
+        raise ValueError(f"Unknown embedding quantization: {quantization}")
+    logging.info(f"Loading embedding model {model_name} ({quantization or 'float32'}) with the {name} backend")
+    if name == "sentence-transformers":
+        return SentenceTransformerBackend(model_name, quantization)
+    if name == "onnx":
+        return OnnxBackend(model_name, quantization)
+    raise ValueError(f"Unknown embedding backend: {name}")
@@ -0,0 +1,154 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from config import EMBEDDING_CACHE_PATH
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DIGEST_SIZE = 16
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embedding vectors for one embedding model
+    (variant, e.g. int8-quantized models get caches of their own).
+
+    Vectors are appended to a raw float32 file that is memory-mapped for reads, and the
+    BLAKE2b digest of each chunk's text is appended to a parallel key file, so the cache is
+    keyed by (model name, chunk text hash) and never needs to be rewritten. Appends are
+    serialised with a file lock, so several ingestion processes can share one cache.
+    """
+
+    def __init__(self, model_name: str, dimension: int, directory: str = EMBEDDING_CACHE_PATH) -> None:
+        self.model_name = model_name
+        self.dimension = dimension
+        self.row_bytes = dimension * np.dtype(np.float32).itemsize
+
+        self.directory = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.keys_path = os.path.join(self.directory, "keys.bin")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.lock_path = os.path.join(self.directory, "lock")
+
+        self.index: Dict[bytes, int] = {}
+        self.rows = 0
+        self._vectors: Optional[np.memmap] = None
+        self._load()
+
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+        self.seconds_per_text = self._load_meta().get("seconds_per_text")
+
+    def _load(self) -> None:
+        """
+        Read the keys written since the last load. Rows whose vector was not completely
+        written (e.g. after a crash) are ignored.
+        """
+        if not os.path.exists(self.keys_path):
+            return
+
+        vector_rows = os.path.getsize(self.vectors_path) // self.row_bytes if os.path.exists(self.vectors_path) else 0
+        with open(self.keys_path, "rb") as f:
+            f.seek(self.rows * DIGEST_SIZE)
+            keys = f.read()
+
+        rows = min(self.rows + len(keys) // DIGEST_SIZE, vector_rows)
+        for row in range(self.rows, rows):
+            offset = (row - self.rows) * DIGEST_SIZE
+            self.index.setdefault(keys[offset:offset + DIGEST_SIZE], row)
+        self.rows = rows
+        self._vectors = None
+
+    def _load_meta(self) -> dict:
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                return json.load(f)
+        return {}
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        return hashlib.blake2b(text.encode(), digest_size=DIGEST_SIZE).digest()
+
+    def _vector_rows(self, rows: List[int]) -> np.ndarray:
+        if self._vectors is None or self._vectors.shape[0] < self.rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.rows, self.dimension))
+        return np.asarray(self._vectors[rows])
+
+    def _append(self, digests: List[bytes], vectors: np.ndarray) -> None:
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Pick up rows appended by other processes so row numbers stay right
+                self._load()
+                with open(self.vectors_path, "ab") as f:
+                    f.truncate(self.rows * self.row_bytes)
+                    f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                with open(self.keys_path, "ab") as f:
+                    f.truncate(self.rows * DIGEST_SIZE)
+                    f.write(b"".join(digests))
+                for i, digest in enumerate(digests):
+                    self.index.setdefault(digest, self.rows + i)
+                self.rows += len(digests)
+                self._vectors = None
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Return the embeddings of texts, only calling encode_fn for texts not in the cache.
+        """
+        digests = [self.digest(text) for text in texts]
+        result = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        hit_positions = [i for i, digest in enumerate(digests) if digest in self.index]
+        if hit_positions:
+            result[hit_positions] = self._vector_rows([self.index[digests[i]] for i in hit_positions])
+
+        # Duplicates within one batch are only encoded once
+        miss_positions: Dict[bytes, List[int]] = {}
+        for i, digest in enumerate(digests):
+            if digest not in self.index:
+                miss_positions.setdefault(digest, []).append(i)
+
+        if miss_positions:
+            miss_digests = list(miss_positions)
+            start = time.perf_counter()
+            vectors = np.asarray(encode_fn([texts[miss_positions[d][0]] for d in miss_digests]), dtype=np.float32)
+            self.encode_seconds += time.perf_counter() - start
+            for digest, vector in zip(miss_digests, vectors):
+                result[miss_positions[digest]] = vector
+            self._append(miss_digests, vectors)
+
+        self.hits += len(hit_positions)
+        self.misses += len(texts) - len(hit_positions)
+        return result
+
+    def report(self) -> str:
+        """
+        Summarise this run's hit rate and the encoding time saved, and remember the
+        measured encoding speed for estimating savings in later runs.
+        """
+        total = self.hits + self.misses
+        if self.misses:
+            self.seconds_per_text = self.encode_seconds / self.misses
+            with open(self.meta_path, "w") as f:
+                json.dump({"model_name": self.model_name, "seconds_per_text": self.seconds_per_text}, f)
+
+        hit_rate = self.hits / total if total else 0.0
+        saved = f"{self.hits * self.seconds_per_text:.1f}s" if self.seconds_per_text is not None else "unknown"
+        return (
+            f"Embedding cache: {self.hits}/{total} hits ({hit_rate:.1%}), {self.misses} encoded "
+            f"in {self.encode_seconds:.1f}s, about {saved} of encoding saved, {self.rows} vectors cached"
+        )
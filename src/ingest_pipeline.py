@@ -0,0 +1,152 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, List, Tuple
+
+from config import PIPELINE_QUEUE_SIZE, PIPELINE_LOG_INTERVAL
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_DONE = object()
+
+
+class _Stopped(Exception):
+    """
+    Raised inside a stage when the pipeline is shutting down.
+    """
+
+
+class StageStats:
+    """
+    Throughput counters of one pipeline stage.
+
+    Time spent blocked on the input queue (starved) or the output queue (backpressure)
+    is tracked separately, so the busy time shows which stage is the bottleneck.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.items = 0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+        self.max_depth = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def busy(self) -> float:
+        return max(0.0, self.elapsed - self.wait_in - self.wait_out)
+
+    def summary(self) -> str:
+        rate = self.items / self.elapsed if self.elapsed else 0.0
+        return (
+            f"{self.name}: {self.items} items ({rate:.1f}/s), busy {self.busy:.1f}s, "
+            f"starved {self.wait_in:.1f}s, blocked {self.wait_out:.1f}s, max queue {self.max_depth}"
+        )
+
+
+def run_pipeline(
+    label: str,
+    source: Tuple[str, Iterable[Any]],
+    stages: List[Tuple[str, Callable[[Iterator[Any]], Iterable[Any]]]],
+    maxsize: int = PIPELINE_QUEUE_SIZE,
+    log_interval: float = PIPELINE_LOG_INTERVAL
+) -> Iterator[Any]:
+    """
+    Run a source and a chain of stages concurrently, each in its own thread, connected by
+    bounded queues, and yield the output of the last stage in the calling thread.
+
+    Each stage is a function from an iterator of inputs to an iterable of outputs, so
+    generator functions can batch or split items freely. Full queues block the stage
+    feeding them, which bounds memory to maxsize items per queue. Queue depth and
+    per-stage throughput are logged every log_interval seconds and summarised at the end.
+    An exception in any stage stops the pipeline and is re-raised to the caller.
+    """
+    names = [source[0]] + [name for name, _ in stages]
+    queues: List[queue.Queue] = [queue.Queue(maxsize) for _ in names]
+    stats = [StageStats(name) for name in names]
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def get(i: int) -> Any:
+        """Take the next item from queue i, accounting the wait to the stage reading it."""
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    return queues[i].get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        raise _Stopped()
+        finally:
+            if i + 1 < len(stats):
+                stats[i + 1].wait_in += time.perf_counter() - start
+
+    def put(i: int, item: Any) -> None:
+        start = time.perf_counter()
+        while True:
+            try:
+                queues[i].put(item, timeout=0.1)
+                break
+            except queue.Full:
+                if stop.is_set():
+                    raise _Stopped()
+        stats[i].wait_out += time.perf_counter() - start
+        stats[i].max_depth = max(stats[i].max_depth, queues[i].qsize())
+
+    def consume(i: int) -> Iterator[Any]:
+        while True:
+            item = get(i)
+            if item is _DONE:
+                return
+            yield item
+
+    def run_stage(i: int, outputs: Iterable[Any]) -> None:
+        try:
+            for item in outputs:
+                put(i, item)
+                stats[i].items += 1
+            put(i, _DONE)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            stats[i].finished = time.perf_counter()
+
+    def monitor() -> None:
+        while not stop.wait(log_interval):
+            logging.info(f"{label} pipeline: " + " | ".join(
+                f"{s.name} {s.items} ({s.items / s.elapsed:.1f}/s) queue {q.qsize()}/{maxsize}"
+                for s, q in zip(stats, queues)
+            ))
+
+    threads = [threading.Thread(target=run_stage, args=(0, source[1]), name=f"{label}-{names[0]}", daemon=True)]
+    for i, (name, fn) in enumerate(stages, start=1):
+        threads.append(threading.Thread(
+            target=run_stage, args=(i, fn(consume(i - 1))), name=f"{label}-{name}", daemon=True
+        ))
+    threads.append(threading.Thread(target=monitor, name=f"{label}-monitor", daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        yield from consume(len(queues) - 1)
+    except _Stopped:
+        pass
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    logging.info(f"{label} pipeline finished: " + "; ".join(s.summary() for s in stats))
@@ -1,53 +1,335 @@
+import atexit
+import codecs
+import json
+import os
 import subprocess
 import logging
 import re
+import threading
+import time
+from typing import Iterator, Optional
 
-from config import LLAMA_BINARY, GPU_LAYERS, TEMPERATURE, MODEL_FILE
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    LLAMA_BINARY, LLAMA_SERVER_BINARY, GPU_LAYERS, TEMPERATURE, MODEL_FILE, TIMEOUT, MAX_TOKENS,
+    LLM_BACKEND, LLAMA_SERVER_HOST, LLAMA_SERVER_PORT, LLAMA_SERVER_CONTEXT_SIZE, LLAMA_SERVER_POOL_SIZE,
+    LLAMA_SERVER_STARTUP_TIMEOUT, LLAMA_SERVER_REQUEST_TIMEOUT, LLAMA_SERVER_LOG
+)
 
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-class LLMIntegration:
-    def __init__(self):
-        logging.info("LLM Integration initialized.")
-
-    @staticmethod
-    def clean_ansi(text: str) -> str:
-        """Removes ANSI escape sequences from output."""
-        return re.sub(r'\x1b\[[0-9;]*[mK]', '', text)
+class SubprocessBackend:
+    """
+    Runs a fresh llama-run process per request. The model is loaded on every call.
+    """
+    name = "subprocess"
 
     @staticmethod
-    def generate_response(query: str, context: str) -> str:
-        """Send query + retrieved context to Llama.cpp and return the response."""
-        full_prompt = f"Using the following rulebook context:\n\n{context}\n\nAnswer the player's question: {query}"
-
-        command = [
+    def _command(prompt: str) -> list:
+        return [
             LLAMA_BINARY,
             "--ngl", GPU_LAYERS,
             "--temp", TEMPERATURE,
             MODEL_FILE,
-            full_prompt  # Ensure the full prompt is a single string argument
+            prompt  # Ensure the full prompt is a single string argument
         ]
 
+    def generate(self, prompt: str) -> str:
+        command = self._command(prompt)
         logging.info("Running Llama.cpp with command: %s", " ".join(command))
 
-        try:
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            output, error = process.communicate()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, error = process.communicate()
+
+        if error:
+            logging.error("Llama.cpp Error: %s", error.decode())
 
+        return output.decode()
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Yield decoded stdout text as llama-run produces it.
+        """
+        command = self._command(prompt)
+        logging.info("Streaming Llama.cpp with command: %s", " ".join(command))
+
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # llama-run writes its load log to stderr; drain it so the pipe never fills up
+        stderr_chunks = []
+        stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+        stderr_reader.start()
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        try:
+            while True:
+                data = os.read(process.stdout.fileno(), 4096)
+                if not data:
+                    break
+                text = decoder.decode(data)
+                if text:
+                    yield text
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            stderr_reader.join(timeout=1)
+            error = b"".join(stderr_chunks)
             if error:
-                logging.error("Llama.cpp Error: %s", error.decode())
+                logging.error("Llama.cpp Error: %s", error.decode(errors="replace"))
+
+    def close(self) -> None:
+        pass
+
+
+class LlamaServerBackend:
+    """
+    Talks to a long-lived llama-server process that keeps the model resident.
+
+    The process is started lazily, restarted if it dies, and stopped at interpreter exit.
+    Requests go through a pooled HTTP session so connections are reused between calls.
+    Prompts are sent as a user message to the OpenAI-compatible chat completions endpoint,
+    so the server formats them with the model's chat template, as llama-run does.
+    """
+    name = "server"
+
+    def __init__(
+        self,
+        host: str = LLAMA_SERVER_HOST,
+        port: int = LLAMA_SERVER_PORT,
+        startup_timeout: float = LLAMA_SERVER_STARTUP_TIMEOUT
+    ) -> None:
+        self.base_url = f"http://{host}:{port}"
+        self.host = host
+        self.port = port
+        self.startup_timeout = startup_timeout
+        self.process: Optional[subprocess.Popen] = None
+        self._log_file = None
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LLAMA_SERVER_POOL_SIZE)
+        self.session.mount("http://", adapter)
+
+        atexit.register(self.close)
+
+    def _is_healthy(self) -> bool:
+        try:
+            response = self.session.get(f"{self.base_url}/health", timeout=TIMEOUT)
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+
+    def _start(self) -> None:
+        command = [
+            LLAMA_SERVER_BINARY,
+            "-m", MODEL_FILE,
+            "--n-gpu-layers", GPU_LAYERS,
+            "--ctx-size", str(LLAMA_SERVER_CONTEXT_SIZE),
+            "--host", self.host,
+            "--port", str(self.port)
+        ]
+        logging.info("Starting llama-server with command: %s", " ".join(command))
+
+        if self._log_file is None:
+            self._log_file = open(LLAMA_SERVER_LOG, "ab")
+        self.process = subprocess.Popen(command, stdout=self._log_file, stderr=subprocess.STDOUT)
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(
+                    f"llama-server exited with code {self.process.returncode} during startup, see {LLAMA_SERVER_LOG}"
+                )
+            # /health answers 503 while the model is still loading
+            if self._is_healthy():
+                logging.info("llama-server ready on %s (pid %s)", self.base_url, self.process.pid)
+                return
+            time.sleep(0.5)
+
+        self._stop_process()
+        raise RuntimeError(f"llama-server did not become healthy within {self.startup_timeout}s")
 
-            result = LLMIntegration.clean_ansi(output.decode()).strip()
+    def ensure_running(self) -> None:
+        """
+        Start the server if it is not running, or restart it if it has died.
+        """
+        with self._lock:
+            if self.process is not None and self.process.poll() is None:
+                return
+            if self.process is not None:
+                logging.warning("llama-server exited with code %s. Restarting.", self.process.returncode)
+            self._start()
 
-            logging.info("Llama Output: %s", result)
+    @staticmethod
+    def _payload(prompt: str, stream: bool = False) -> dict:
+        payload = {
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": float(TEMPERATURE),
+            "cache_prompt": True,
+            "stream": stream
+        }
+        if MAX_TOKENS is not None:
+            payload["max_tokens"] = MAX_TOKENS
+        return payload
+
+    def generate(self, prompt: str) -> str:
+        self.ensure_running()
+        response = self.session.post(
+            f"{self.base_url}/v1/chat/completions",
+            json=self._payload(prompt),
+            timeout=(TIMEOUT, LLAMA_SERVER_REQUEST_TIMEOUT)
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"].get("content") or ""
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Yield tokens from the server's server-sent event stream as they are generated.
+        """
+        self.ensure_running()
+        with self.session.post(
+            f"{self.base_url}/v1/chat/completions",
+            json=self._payload(prompt, stream=True),
+            stream=True,
+            timeout=(TIMEOUT, LLAMA_SERVER_REQUEST_TIMEOUT)
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data == "[DONE]":
+                    break
+                for choice in json.loads(data).get("choices", []):
+                    content = choice.get("delta", {}).get("content")
+                    if content:
+                        yield content
+
+    def _stop_process(self) -> None:
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop_process()
+            self.process = None
+        self.session.close()
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+
+def create_backend(name: str = LLM_BACKEND):
+    """
+    Create the configured LLM backend, falling back to the subprocess backend
+    if the llama-server cannot be started.
+    """
+    if name == "subprocess":
+        return SubprocessBackend()
+    if name != "server":
+        raise ValueError(f"Unknown LLM backend: {name}")
+
+    backend = LlamaServerBackend()
+    try:
+        backend.ensure_running()
+    except Exception:
+        logging.exception("Failed to start llama-server. Falling back to subprocess backend.")
+        backend.close()
+        return SubprocessBackend()
+    return backend
+
+
+class LLMIntegration:
+    def __init__(self, backend: str = LLM_BACKEND):
+        self.backend = create_backend(backend)
+        logging.info("LLM Integration initialized with %s backend.", self.backend.name)
+
+    @staticmethod
+    def clean_ansi(text: str) -> str:
+        """Removes ANSI escape sequences from output."""
+        return re.sub(r'\x1b\[[0-9;]*[mK]', '', text)
+
+    @staticmethod
+    def build_prompt(query: str, context: str) -> str:
+        """Combine the player's question with the retrieved rulebook context."""
+        return f"Using the following rulebook context:\n\n{context}\n\nAnswer the player's question: {query}"
+
+    def generate_response(self, query: str, context: str) -> str:
+        """Send query + retrieved context to Llama.cpp and return the response."""
+        full_prompt = self.build_prompt(query, context)
+
+        try:
+            start = time.perf_counter()
+            output = self.backend.generate(full_prompt)
+            result = self.clean_ansi(output).strip()
+
+            logging.info("Llama Output (%s, %.2fs): %s", self.backend.name, time.perf_counter() - start, result)
             return result
         except Exception as e:
             logging.exception("Exception occurred while running Llama.cpp")
             return "Error occurred during LLM processing."
 
+    def stream_response(self, query: str, context: str) -> Iterator[str]:
+        """
+        Send query + retrieved context to Llama.cpp and yield cleaned text as it arrives, in
+        the pieces the backend produces it in (a token from llama-server, a read from llama-run).
+        Logs time-to-first-token and total generation time for every request.
+        """
+        full_prompt = self.build_prompt(query, context)
+        start = time.perf_counter()
+        first_token_at = None
+        n_pieces = 0
+        # A colour or erase-line code can be split across two pieces, so hold back a tail that
+        # could still become one; anything else after an escape is passed through as it comes
+        pending = ""
+
+        try:
+            for piece in self.backend.stream(full_prompt):
+                pending += piece
+                escape_at = pending.rfind("\x1b")
+                if escape_at != -1 and re.fullmatch(r'\x1b(\[[0-9;]*)?', pending[escape_at:]):
+                    text, pending = pending[:escape_at], pending[escape_at:]
+                else:
+                    text, pending = pending, ""
+
+                text = self.clean_ansi(text)
+                if not text:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    logging.info("Time to first token (%s): %.3fs", self.backend.name, first_token_at - start)
+                n_pieces += 1
+                yield text
+
+            text = self.clean_ansi(pending)
+            if text:
+                n_pieces += 1
+                yield text
+        finally:
+            elapsed = time.perf_counter() - start
+            ttft = (first_token_at - start) if first_token_at is not None else float("nan")
+            logging.info(
+                "Streamed %d pieces (%s) in %.2fs, time to first token %.3fs",
+                n_pieces, self.backend.name, elapsed, ttft
+            )
+
+    def close(self) -> None:
+        self.backend.close()
+
 
 if __name__ == "__main__":
-    llm = LLMIntegration()
\ No newline at end of file
+    llm = LLMIntegration()
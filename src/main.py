@@ -1,8 +1,10 @@
+import json
 import logging
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from retriever import Retriever
 from llm_integration import LLMIntegration
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Iterator, Optional, Union
 import os
 
 
@@ -12,7 +14,42 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 app = FastAPI()
 retriever = Retriever()
-llm = LLMIntegration()
+# Created at startup: starting llama-server can take minutes while it loads the model
+llm: Optional[LLMIntegration] = None
+
+
+def format_citation(source: str, page_start: Optional[int], page_end: Optional[int]) -> Optional[str]:
+    """
+    Page citation of a chunk, e.g. "handbook.pdf, p. 12" or "handbook.pdf, pp. 12-13".
+    """
+    if page_start is None:
+        return None
+    if page_end is None or page_end == page_start:
+        return f"{source}, p. {page_start}"
+    return f"{source}, pp. {page_start}-{page_end}"
+
+
+def format_occurrences(occurrences: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Every place a deduplicated chunk occurs, from the JSON list in its "occurrences" metadata,
+    each with its source, page span and citation.
+    """
+    if not occurrences:
+        return []
+
+    formatted = []
+    for occurrence in json.loads(occurrences):
+        source = os.path.basename(str(occurrence.get("source", "unknown")))
+        page_start = occurrence.get("page_start")
+        page_end = occurrence.get("page_end")
+        formatted.append({
+            "source": source,
+            "chunk_index": occurrence.get("chunk_index", -1),
+            "page_start": page_start,
+            "page_end": page_end,
+            "citation": format_citation(source, page_start, page_end)
+        })
+    return formatted
 
 
 def format_search_results(
@@ -21,7 +58,10 @@ def format_search_results(
 ) -> List[Dict[str, Any]]:
     """
     Takes raw ChromaDB results and formats them with metadata.
-    Flattens nested lists and zips results into a structured format.
+    Flattens nested lists and zips results into a structured format, with the page span,
+    character offsets and a page citation of each chunk where its metadata has them. Chunks
+    whose text occurs in several places list all of them under "occurrences"; the other
+    fields describe the first.
     """
     documents = documents_nested[0] if documents_nested and isinstance(documents_nested[0], list) else documents_nested
     metadatas = metadatas_nested[0] if metadatas_nested and isinstance(metadatas_nested[0], list) else metadatas_nested
@@ -33,20 +73,58 @@ def format_search_results(
     for doc, meta in zip(documents, metadatas):
         source = "unknown"
         chunk_index = -1
+        page_start = page_end = start_offset = end_offset = None
+        occurrences: List[Dict[str, Any]] = []
 
         if isinstance(meta, dict):
             source = os.path.basename(str(meta.get("source", "unknown")))
             chunk_index = meta.get("chunk_index", -1)
+            page_start = meta.get("page_start")
+            page_end = meta.get("page_end")
+            start_offset = meta.get("start_offset")
+            end_offset = meta.get("end_offset")
+            occurrences = format_occurrences(meta.get("occurrences"))
 
         combined.append({
             "text": doc,
             "source": source,
-            "chunk_index": chunk_index
+            "chunk_index": chunk_index,
+            "page_start": page_start,
+            "page_end": page_end,
+            "start_offset": start_offset,
+            "end_offset": end_offset,
+            "citation": format_citation(source, page_start, page_end),
+            "occurrences": occurrences
         })
 
     return combined
 
 
+def format_sse(event: str, data: Any) -> str:
+    """
+    Encode a single Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.on_event("startup")
+def startup() -> None:
+    """
+    Start the LLM backend (and its llama-server process) when the API starts, not on import.
+    """
+    global llm
+    llm = LLMIntegration()
+
+
+@app.on_event("shutdown")
+def shutdown() -> None:
+    """
+    Stop the llama-server process (if any) together with the API.
+    """
+    if llm is not None:
+        llm.close()
+
+
 @app.get("/")
 def read_root() -> dict:
     """
@@ -91,3 +169,37 @@ def ai_search(query: str) -> dict:
         logging.error(f"Error during AI search: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+
+@app.get("/ai-search/stream")
+def ai_search_stream(query: str) -> StreamingResponse:
+    """
+    Retrieve rules and stream the AI answer as Server-Sent Events.
+    Sends a "sources" event first, then one "token" event per generated token and a final "done" event.
+    """
+    try:
+        search_results = retriever.search(query)
+        sources = format_search_results(
+            documents_nested=search_results.get("documents", []),
+            metadatas_nested=search_results.get("metadatas", [])
+        )
+    except Exception as e:
+        logging.error(f"Error during AI search: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    retrieved_context = "\n".join(result["text"] for result in sources)
+
+    def event_stream() -> Iterator[str]:
+        yield format_sse("sources", sources)
+        try:
+            for token in llm.stream_response(query, retrieved_context):
+                yield format_sse("token", token)
+        except Exception as e:
+            logging.error(f"Error during AI search stream: {e}")
+            yield format_sse("error", "Error occurred during LLM processing.")
+        yield format_sse("done", None)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
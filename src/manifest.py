@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, List, MutableMapping, Optional, Set, Tuple, Union
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# A manifest entry: a dict with the file's hash, size, mtime_ns and inode, the content
+# hash of each page ("pages"), a [page_start, page_end, chunk key, start_offset, end_offset]
+# record for each of its chunks ("chunks"), followed by the key of the chunk it is stored as
+# if it was merged into a near-duplicate, the extractor, text format, storage layout and
+# chunk settings used ("extractor", "format", "storage", "chunking") and how long it took to
+# ingest ("ingest_seconds"), or a bare MD5 hex digest in manifests written by older versions.
+FileRecord = Union[str, Dict[str, Any]]
+
+# Entry fields kept in columns of their own; the rest is stored as JSON in "details"
+COLUMNS = ("hash", "size", "mtime_ns", "inode", "ingest_seconds")
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        hash TEXT NOT NULL,
+        size INTEGER,
+        mtime_ns INTEGER,
+        inode INTEGER,
+        chunk_count INTEGER NOT NULL,
+        generation INTEGER NOT NULL,
+        ingested_at REAL,
+        ingest_seconds REAL,
+        details TEXT
+    )
+"""
+
+
+class Manifest(MutableMapping[str, FileRecord]):
+    """
+    The processed files manifest: one row per ingested PDF file in an SQLite database.
+
+    Behaves like a dict of file path to manifest entry, but every assignment or deletion
+    writes just that file's row, in a transaction of its own, so updates cost the same
+    however large the library is and are on disk as soon as they return. The database is
+    in WAL mode and writers wait up to a minute for each other, so several ingestion runs
+    (and readers) can update it at once without overwriting each other's entries. This only
+    covers the manifest: the chunks its entries list are shared between files, and it is
+    the chunk store's lock file (CHUNK_STORE_LOCK_PATH) that keeps concurrent runs from
+    losing each other's updates to them.
+
+    Besides the entry, each row has the file's chunk count, its ingest generation (how
+    many times its chunks have been stored) and when that last happened. A manifest
+    written by older versions as a JSON file is imported the first time the database is
+    opened, and the JSON file is kept with a ".migrated" suffix.
+    """
+
+    def __init__(self, path: str, legacy_json_path: Optional[str] = None) -> None:
+        self.path = path
+        # Content hashes of the entries this instance replaced or deleted
+        self.replaced_hashes: Set[str] = set()
+        # Autocommit: each statement is its own transaction unless one is opened explicitly
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=FULL")
+        self._initialize(legacy_json_path)
+
+    def _initialize(self, legacy_json_path: Optional[str]) -> None:
+        """
+        Create the schema and import the JSON manifest, once, even if several processes
+        open a new database at the same time.
+        """
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        migrated = False
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self.connection.execute(SCHEMA)
+                if legacy_json_path and os.path.exists(legacy_json_path):
+                    self._migrate(legacy_json_path)
+                    migrated = True
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+
+        if migrated:
+            os.replace(legacy_json_path, f"{legacy_json_path}.migrated")
+
+    def _migrate(self, legacy_json_path: str) -> None:
+        with open(legacy_json_path, "r") as f:
+            entries: Dict[str, FileRecord] = json.load(f)
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [self._row(path, record, None) for path, record in entries.items()]
+        )
+        logging.info(f"Migrated {len(entries)} entries from {legacy_json_path} to {self.path}.")
+
+    @staticmethod
+    def _row(path: str, record: FileRecord, ingested_at: Optional[float]) -> Tuple[Any, ...]:
+        """
+        The row of a new entry, in column order.
+        """
+        if not isinstance(record, dict):
+            return path, record, None, None, None, 0, 1, ingested_at, None, None
+        details = {key: value for key, value in record.items() if key not in COLUMNS}
+        return (
+            path, record["hash"], record.get("size"), record.get("mtime_ns"), record.get("inode"),
+            len(details.get("chunks", [])), 1, ingested_at, record.get("ingest_seconds"), json.dumps(details)
+        )
+
+    @staticmethod
+    def _record(row: Tuple[Any, ...]) -> FileRecord:
+        file_hash, size, mtime_ns, inode, ingest_seconds, details = row
+        if details is None:
+            return file_hash
+        record = {"hash": file_hash, "size": size, "mtime_ns": mtime_ns, "inode": inode, **json.loads(details)}
+        if ingest_seconds is not None:
+            record["ingest_seconds"] = ingest_seconds
+        return record
+
+    def __getitem__(self, path: str) -> FileRecord:
+        row = self.connection.execute(
+            "SELECT hash, size, mtime_ns, inode, ingest_seconds, details FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(path)
+        return self._record(row)
+
+    def _replace(self, path: str, file_hash: Optional[str]) -> None:
+        previous = self.connection.execute("SELECT hash FROM files WHERE path = ?", (path,)).fetchone()
+        if previous is not None and previous[0] != file_hash:
+            self.replaced_hashes.add(previous[0])
+
+    def __setitem__(self, path: str, record: FileRecord) -> None:
+        self._replace(path, record["hash"] if isinstance(record, dict) else record)
+        # The generation and ingest time only move on when the stored chunks changed
+        self.connection.execute(
+            """
+            INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                hash = excluded.hash,
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                inode = excluded.inode,
+                chunk_count = excluded.chunk_count,
+                generation = generation + (details IS NOT excluded.details),
+                ingested_at = CASE WHEN details IS excluded.details THEN ingested_at ELSE excluded.ingested_at END,
+                ingest_seconds = excluded.ingest_seconds,
+                details = excluded.details
+            """,
+            self._row(path, record, time.time())
+        )
+
+    def __delitem__(self, path: str) -> None:
+        self._replace(path, None)
+        if self.connection.execute("DELETE FROM files WHERE path = ?", (path,)).rowcount == 0:
+            raise KeyError(path)
+
+    def __contains__(self, path: object) -> bool:
+        return self.connection.execute("SELECT 1 FROM files WHERE path = ?", (path,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        # A snapshot, so the manifest can be changed while iterating
+        return iter([path for path, in self.connection.execute("SELECT path FROM files ORDER BY path")])
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def items(self) -> List[Tuple[str, FileRecord]]:  # type: ignore[override]
+        rows = self.connection.execute(
+            "SELECT path, hash, size, mtime_ns, inode, ingest_seconds, details FROM files ORDER BY path"
+        )
+        return [(row[0], self._record(row[1:])) for row in rows]
+
+    def chunk_count(self) -> int:
+        """
+        The number of chunks of all files, duplicates included.
+        """
+        return self.connection.execute("SELECT COALESCE(SUM(chunk_count), 0) FROM files").fetchone()[0]
+
+    def file_hashes(self) -> Set[str]:
+        """
+        The content hashes of all files with a current (non-MD5) entry.
+        """
+        return {file_hash for file_hash, in self.connection.execute("SELECT hash FROM files WHERE details IS NOT NULL")}
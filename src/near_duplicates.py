@@ -0,0 +1,241 @@
+import difflib
+import logging
+import re
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import mmh3
+import numpy as np
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MAX_HASH = np.uint64((1 << 32) - 1)
+# Multipliers combining the hashes of the words of a shingle (odd 64-bit constants)
+SHINGLE_MULTIPLIERS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+SHINGLE_WORDS = 3
+
+WORD_PATTERN = re.compile(r"\w+")
+# A word hyphenated across a line break, e.g. "satu-\nrated"
+HYPHENATION_PATTERN = re.compile(r"(\w)-[ \t]*\n\s*(\w)")
+# Most words a page header or footer that only one of two near-duplicates has can have
+HEADER_WORDS = 12
+# Candidates are checked against the threshold and with same_text, so a false candidate
+# only costs a comparison while a missed near-duplicate costs a vector: the band layout
+# weighs missing a chunk above the threshold this many times more than a false candidate
+FALSE_NEGATIVE_WEIGHT = 16
+
+
+def normalize(text: str) -> List[str]:
+    """
+    The lowercased words of a text, with words hyphenated across line breaks joined, so
+    whitespace, punctuation and line wrapping do not affect its shingles.
+    """
+    return WORD_PATTERN.findall(HYPHENATION_PATTERN.sub(r"\1\2", text).lower())
+
+
+def same_text(text: str, other: str) -> bool:
+    """
+    Check whether two near-duplicate texts say the same thing: their normalized words
+    may only differ by words split or joined differently (hyphenation the pattern above
+    does not catch, say) and by up to HEADER_WORDS words at the very start or end that
+    one of them has and the other does not (a page header or footer). Any other
+    difference, such as a changed number in a rule, keeps them apart.
+    """
+    words, other_words = normalize(text), normalize(other)
+    matcher = difflib.SequenceMatcher(None, words, other_words, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal" or "".join(words[i1:i2]) == "".join(other_words[j1:j2]):
+            continue
+        at_edge = (i1 == j1 == 0) or (i2 == len(words) and j2 == len(other_words))
+        if tag != "replace" and at_edge and max(i2 - i1, j2 - j1) <= HEADER_WORDS:
+            continue
+        return False
+    return True
+
+
+def lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Choose the number of LSH bands and rows per band for a Jaccard similarity threshold,
+    minimising the false positive probability mass plus FALSE_NEGATIVE_WEIGHT times the
+    false negative probability mass.
+    """
+    similarity = np.linspace(0, 1, 201)
+    best = (float("inf"), 1, num_perm)
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            candidate = 1 - (1 - similarity ** rows) ** bands
+            error = (
+                candidate[similarity < threshold].sum()
+                + FALSE_NEGATIVE_WEIGHT * (1 - candidate[similarity >= threshold]).sum()
+            )
+            best = min(best, (error, bands, rows))
+    return best[1], best[2]
+
+
+class MinHasher:
+    """
+    MinHash signatures of the word 3-gram shingles of texts.
+
+    Words are hashed with MurmurHash3 once each (the hashes of seen words are kept), the
+    hashes of each shingle's words are combined and every permutation is a multiply-shift
+    hash, the high 32 bits of (a * x + b) mod 2^64 for an odd a, applied to all shingles of
+    a text at once with numpy.
+    """
+
+    def __init__(self, num_perm: int, seed: int = 1) -> None:
+        self.num_perm = num_perm
+        rng = np.random.RandomState(seed)
+        # One row per permutation, so each minimum is taken over a contiguous row
+        self.a = (rng.randint(0, 1 << 63, num_perm, dtype=np.uint64) << np.uint64(1) | np.uint64(1))[:, None]
+        self.b = rng.randint(0, 1 << 63, num_perm, dtype=np.uint64)[:, None]
+        self.word_hashes: Dict[str, int] = {}
+
+    def _hash_words(self, words: List[str]) -> np.ndarray:
+        if len(self.word_hashes) > 1_000_000:
+            self.word_hashes.clear()
+        hashes = []
+        for word in words:
+            hashed = self.word_hashes.get(word)
+            if hashed is None:
+                hashed = self.word_hashes[word] = mmh3.hash(word, signed=False)
+            hashes.append(hashed)
+        return np.array(hashes, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        The MinHash signature of a text, or None if it has no words.
+        """
+        words = normalize(text)
+        if not words:
+            return None
+
+        hashes = self._hash_words(words)
+        if len(hashes) >= SHINGLE_WORDS:
+            hashes = (
+                hashes[:-2] * SHINGLE_MULTIPLIERS[0] + hashes[1:-1] * SHINGLE_MULTIPLIERS[1] + hashes[2:]
+            )
+            hashes = (hashes ^ (hashes >> np.uint64(32))) & MAX_HASH
+        shingles = np.unique(hashes)
+
+        permuted = (self.a * shingles + self.b) >> np.uint64(32)
+        return permuted.min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash LSH index of stored chunks, for finding near-duplicates of new ones.
+
+    Each chunk's signature is kept in an SQLite database, along with one bucket per LSH band
+    (a hash of the band number and that band of the signature). Chunks sharing a bucket with
+    a new chunk are candidates, and those whose estimated Jaccard similarity reaches the
+    threshold are its near-duplicates. The band layout is derived from the threshold; when it changes, the
+    buckets are rebuilt from the stored signatures. Chunks that have no signature (no words)
+    are recorded with an empty one and no buckets, so that every stored chunk is accounted for.
+
+    The chunk store makes its index updates under its lock file, so a write transaction may
+    stay open across its ChromaDB writes (the index is only committed once the chunks it
+    lists are stored). Other connections wait for it rather than failing at once.
+    """
+
+    def __init__(self, path: str, threshold: float, num_perm: int) -> None:
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS signatures (key TEXT PRIMARY KEY, signature BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER NOT NULL, key TEXT NOT NULL, PRIMARY KEY (bucket, key)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS buckets_by_key ON buckets (key);
+        """)
+        self._check_settings(num_perm)
+
+    def _check_settings(self, num_perm: int) -> None:
+        settings = dict(self.connection.execute("SELECT name, value FROM settings"))
+        if settings.get("permutations", num_perm) != num_perm:
+            logging.warning("MinHash permutations changed: clearing the near-duplicate index.")
+            self.connection.execute("DELETE FROM signatures")
+            self.connection.execute("DELETE FROM buckets")
+        elif (settings.get("bands"), settings.get("rows")) not in ((None, None), (self.bands, self.rows)):
+            logging.info(f"Near-duplicate threshold changed: rebuilding LSH buckets ({self.bands} bands of {self.rows}).")
+            self.connection.execute("DELETE FROM buckets")
+            rows = self.connection.execute("SELECT key, signature FROM signatures WHERE length(signature) > 0")
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO buckets VALUES (?, ?)",
+                (
+                    (bucket, key)
+                    for key, signature in rows.fetchall()
+                    for bucket in self._buckets(np.frombuffer(signature, dtype=np.uint32))
+                )
+            )
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO settings VALUES (?, ?)",
+            [("permutations", num_perm), ("bands", self.bands), ("rows", self.rows)]
+        )
+        self.connection.commit()
+
+    def _buckets(self, signature: np.ndarray) -> List[int]:
+        return [
+            mmh3.hash64(signature[band * self.rows:(band + 1) * self.rows].tobytes(), seed=band)[0]
+            for band in range(self.bands)
+        ]
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        return self.hasher.signature(text)
+
+    def count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def keys(self) -> List[str]:
+        return [key for key, in self.connection.execute("SELECT key FROM signatures")]
+
+    def query(self, signature: np.ndarray) -> List[Tuple[str, float]]:
+        """
+        The indexed chunks whose estimated similarity to a signature reaches the threshold,
+        as (key, similarity), most similar first.
+        """
+        buckets = self._buckets(signature)
+        rows = self.connection.execute(
+            "SELECT key, signature FROM signatures WHERE key IN "
+            f"(SELECT key FROM buckets WHERE bucket IN ({', '.join('?' * len(buckets))}))",
+            buckets
+        )
+        matches = []
+        for key, candidate in rows:
+            similarity = float(np.mean(np.frombuffer(candidate, dtype=np.uint32) == signature))
+            if similarity >= self.threshold:
+                matches.append((key, similarity))
+        matches.sort(key=lambda match: -match[1])
+        return matches
+
+    def add(self, entries: Iterable[Tuple[str, Optional[np.ndarray]]]) -> None:
+        """
+        Index (key, signature) entries; a key whose signature is None is only recorded as
+        indexed. Call commit() to make them durable.
+        """
+        entries = list(entries)
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO signatures VALUES (?, ?)",
+            [(key, b"" if signature is None else signature.tobytes()) for key, signature in entries]
+        )
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO buckets VALUES (?, ?)",
+            [
+                (bucket, key)
+                for key, signature in entries if signature is not None
+                for bucket in self._buckets(signature)
+            ]
+        )
+
+    def remove(self, keys: Iterable[str]) -> None:
+        keys = [(key,) for key in keys]
+        self.connection.executemany("DELETE FROM signatures WHERE key = ?", keys)
+        self.connection.executemany("DELETE FROM buckets WHERE key = ?", keys)
+
+    def commit(self) -> None:
+        self.connection.commit()
@@ -0,0 +1,96 @@
+import io
+import json
+import logging
+import os
+from typing import Iterable, Iterator, Set
+
+import zstandard
+
+from config import PAGE_CACHE_PATH
+from pdf_extractors import EXTRACTION_VERSION, PageContent
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SUFFIX = ".jsonl.zst"
+
+
+class PageCache:
+    """
+    On-disk cache of extracted page text and table text, keyed by file hash and page number.
+
+    Each PDF is stored as one zstd-compressed JSON Lines file named after its content hash,
+    the extractor that produced it and the extraction format version, with one
+    {"page", "text", "table_text"} line per page. Files are written under a temporary name
+    and renamed once every page is in, so an entry is always complete, and several
+    ingestion processes can share the cache.
+    """
+
+    def __init__(self, extractor_name: str, directory: str = PAGE_CACHE_PATH, level: int = 3) -> None:
+        self.extractor_name = extractor_name
+        self.directory = directory
+        self.level = level
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, file_hash: str) -> str:
+        return os.path.join(self.directory, f"{file_hash}.{self.extractor_name}.v{EXTRACTION_VERSION}{SUFFIX}")
+
+    def contains(self, file_hash: str) -> bool:
+        return os.path.exists(self.path(file_hash))
+
+    def iter_pages(self, file_hash: str) -> Iterator[PageContent]:
+        """
+        Stream the cached pages of a PDF file in page order.
+        """
+        with open(self.path(file_hash), "rb") as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(f)
+            for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                page = json.loads(line)
+                yield PageContent(page["page"], page["text"], page["table_text"])
+
+    def store(self, file_hash: str, pages: Iterable[PageContent]) -> Iterator[PageContent]:
+        """
+        Pass extracted pages through while writing them to the cache. The entry is only
+        committed once all pages have been consumed.
+        """
+        path = self.path(file_hash)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        committed = False
+        try:
+            with open(temp_path, "wb") as f:
+                writer = zstandard.ZstdCompressor(level=self.level).stream_writer(f)
+                for page in pages:
+                    line = {"page": page.page_number, "text": page.text, "table_text": page.table_text}
+                    writer.write((json.dumps(line) + "\n").encode())
+                    yield page
+                writer.flush(zstandard.FLUSH_FRAME)
+            os.replace(temp_path, path)
+            committed = True
+        finally:
+            if not committed and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def prune(self, replaced_hashes: Set[str], file_hashes: Set[str]) -> int:
+        """
+        Delete the entries of replaced_hashes (old versions of PDFs this run changed or
+        removed) that are not in file_hashes (the current manifest entries), and entries of
+        another extractor or extraction format.
+        Entries of other hashes are kept, even if no manifest entry has them: another
+        ingestion run may have just written them for a file it has not recorded yet.
+        Returns the number of entries deleted.
+        """
+        current = os.path.basename(self.path(""))
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(SUFFIX):
+                continue
+            if name.endswith(current):
+                file_hash = name[:-len(current)]
+                if file_hash not in replaced_hashes or file_hash in file_hashes:
+                    continue
+            os.remove(os.path.join(self.directory, name))
+            removed += 1
+        if removed:
+            logging.info(f"Removed {removed} outdated entries from the page cache.")
+        return removed
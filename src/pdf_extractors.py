@@ -0,0 +1,231 @@
+import logging
+import os
+import time
+from typing import Iterator, NamedTuple, Optional
+
+import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from config import PDF_EXTRACTOR, PDFIUM_TABLE_MIN_PATHS, TABLE_CHECK_SAMPLE_EVERY
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Version of the extracted page text format. Bump it whenever the text of a page changes
+# (e.g. how tables are rendered), so cached pages and stored chunks are re-extracted.
+EXTRACTION_VERSION = 2
+
+
+class PageContent(NamedTuple):
+    """
+    Text and table text extracted from a single PDF page.
+    """
+    page_number: int
+    text: str
+    table_text: str
+
+
+class TableCheckStats:
+    """
+    How often the table pre-check let extract_tables be skipped during one extraction.
+
+    Every sample_every-th skipped page is still run through extract_tables, to time the
+    calls that were avoided (and to confirm they would not have found a table).
+    """
+
+    def __init__(self, sample_every: int = TABLE_CHECK_SAMPLE_EVERY) -> None:
+        self.sample_every = sample_every
+        self.pages = 0
+        self.skipped = 0
+        self.sampled = 0
+        self.sample_seconds = 0.0
+
+    def should_sample(self) -> bool:
+        return self.sample_every > 0 and self.skipped % self.sample_every == 1 % self.sample_every
+
+    def report(self) -> str:
+        avoided = self.skipped - self.sampled
+        if self.sampled:
+            saved = f"about {avoided * self.sample_seconds / self.sampled:.2f}s"
+        else:
+            saved = "unknown time"
+        return f"table extraction skipped on {avoided} of {self.pages} pages, {saved} saved"
+
+
+def may_have_tables(page: pdfplumber.page.Page) -> bool:
+    """
+    Cheap check whether extract_tables can find anything on a page.
+
+    With the default "lines" strategy, table cells are built from the edges of the page's
+    rect, line and curve objects, so a table needs at least two horizontal and two vertical
+    edges. Pages below that (most prose pages) cannot have a table.
+    """
+    return len(page.horizontal_edges) >= 2 and len(page.vertical_edges) >= 2
+
+
+def extract_tables(page: pdfplumber.page.Page, stats: TableCheckStats) -> list:
+    """
+    Run extract_tables on a page unless the pre-check rules out any table.
+    """
+    stats.pages += 1
+    if may_have_tables(page):
+        return page.extract_tables() or []
+
+    stats.skipped += 1
+    if not stats.should_sample():
+        return []
+
+    stats.sampled += 1
+    start = time.perf_counter()
+    tables = page.extract_tables() or []
+    stats.sample_seconds += time.perf_counter() - start
+    if tables:
+        logging.warning(f"Table pre-check missed a table on page {page.page_number}")
+    return tables
+
+
+def extract_page(page: pdfplumber.page.Page, stats: TableCheckStats) -> PageContent:
+    """
+    Extract the text and tables of a single PDF page.
+    """
+    page_text = page.extract_text() or ""
+    tables = extract_tables(page, stats)
+
+    table_parts = []
+    for table in tables:
+        formatted = "\n".join([
+            " | ".join(cell or "" for cell in row)
+            for row in table if any((cell or "").strip() for cell in row)
+        ])
+        table_parts.append(f"\n{formatted}\n")
+
+    return PageContent(page.page_number, page_text, "".join(table_parts))
+
+
+def page_range_label(file: str, start: int, end: Optional[int]) -> str:
+    name = os.path.basename(file)
+    if start == 0 and end is None:
+        return name
+    return f"{name} pages {start + 1}-{end if end is not None else 'end'}"
+
+
+class PdfplumberExtractor:
+    """
+    Extracts every page with pdfplumber's layout analysis. Slow, but finds ruled tables.
+    """
+    name = "pdfplumber"
+
+    def page_count(self, file: str) -> int:
+        with pdfplumber.open(file) as pdf:
+            return len(pdf.pages)
+
+    def iter_pages(self, file: str, start: int = 0, end: Optional[int] = None) -> Iterator[PageContent]:
+        """
+        Yield the extracted content of pages [start, end) (0-based) of a PDF file one page at a time.
+        Each page's parsed layout is released as soon as it has been extracted, so memory use
+        does not grow with the number of pages.
+        """
+        stats = TableCheckStats()
+        pages = None if end is None else range(start + 1, end + 1)
+        with pdfplumber.open(file, pages=pages) as pdf:
+            for page in pdf.pages:
+                if page.page_number <= start:
+                    continue
+                content = extract_page(page, stats)
+                page.close()
+                yield content
+        logging.info(f"{page_range_label(file, start, end)}: {stats.report()}")
+
+
+class PdfiumExtractor:
+    """
+    Extracts the plain text of prose pages with PDFium, which needs no layout analysis
+    and is many times faster than pdfplumber.
+
+    pdfplumber only finds tables whose cells are drawn with lines and rectangles, so a page
+    without vector path objects cannot hold one. Pages with at least table_min_paths path
+    objects are handed to pdfplumber instead, so their tables are still extracted.
+    """
+    name = "pdfium"
+
+    def __init__(self, table_min_paths: int = PDFIUM_TABLE_MIN_PATHS) -> None:
+        self.table_min_paths = table_min_paths
+        self.text_pages = 0
+        self.table_pages = 0
+
+    def page_count(self, file: str) -> int:
+        document = pdfium.PdfDocument(file)
+        try:
+            return len(document)
+        finally:
+            document.close()
+
+    def may_have_tables(self, page: pdfium.PdfPage) -> bool:
+        paths = 0
+        for _ in page.get_objects(filter=(pdfium_c.FPDF_PAGEOBJ_PATH,)):
+            paths += 1
+            if paths >= self.table_min_paths:
+                return True
+        return False
+
+    @staticmethod
+    def extract_text(page: pdfium.PdfPage) -> str:
+        textpage = page.get_textpage()
+        try:
+            # force_this: the default call is redirected to get_text_bounded(), which
+            # drops text running past the page box
+            text = textpage.get_text_range(force_this=True)
+        finally:
+            textpage.close()
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+
+    def iter_pages(self, file: str, start: int = 0, end: Optional[int] = None) -> Iterator[PageContent]:
+        """
+        Yield the extracted content of pages [start, end) (0-based) of a PDF file one page at a time.
+        """
+        label = page_range_label(file, start, end)
+        document = pdfium.PdfDocument(file)
+        plumber_pdf = None
+        stats = TableCheckStats()
+        text_pages = table_pages = 0
+        try:
+            end = len(document) if end is None else min(end, len(document))
+            for index in range(start, end):
+                page = document[index]
+                try:
+                    if self.may_have_tables(page):
+                        if plumber_pdf is None:
+                            plumber_pdf = pdfplumber.open(file)
+                        plumber_page = plumber_pdf.pages[index]
+                        content = extract_page(plumber_page, stats)
+                        plumber_page.close()
+                        table_pages += 1
+                    else:
+                        content = PageContent(index + 1, self.extract_text(page), "")
+                        text_pages += 1
+                finally:
+                    page.close()
+                yield content
+            logging.info(
+                f"{label}: {text_pages} pages extracted with PDFium, "
+                f"{table_pages} with pdfplumber, {stats.report()}"
+            )
+            self.text_pages += text_pages
+            self.table_pages += table_pages
+        finally:
+            if plumber_pdf is not None:
+                plumber_pdf.close()
+            document.close()
+
+
+def get_extractor(name: str = PDF_EXTRACTOR):
+    """
+    Create the configured PDF text extractor.
+    """
+    if name == "pdfplumber":
+        return PdfplumberExtractor()
+    if name == "pdfium":
+        return PdfiumExtractor()
+    raise ValueError(f"Unknown PDF extractor: {name}")
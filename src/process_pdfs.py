@@ -1,24 +1,162 @@
 import os
-import json
 import hashlib
 import logging
-from typing import Dict
-import chromadb
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
+import argparse
+import bisect
+import functools
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple
 import pdfplumber
+from watchfiles import Change, watch
+from pdfminer.pdftypes import PDFObjRef, PDFStream, resolve1
 
-from config import CHROMADB_PATH, DB_COLLECTION, EMBEDDING_MODEL_NAME, HASH_FILE_PATH, PDF_STORE
+from chunk_store import ChunkStore, Occurrence, chunk_key
+from embedding_backends import EmbeddingBackend, cache_name, create_embedding_backend
+from embedding_cache import EmbeddingCache
+from manifest import FileRecord, Manifest
+from near_duplicates import NearDuplicateIndex
+from page_cache import PageCache
+from pdf_extractors import EXTRACTION_VERSION, PageContent, get_extractor
+from splitter import RecursiveTextSplitter
+from token_splitter import TokenAwareTextSplitter
+from ingest_pipeline import run_pipeline
+if TYPE_CHECKING:
+    import chromadb
+
+from config import (
+    CHROMADB_PATH, DB_COLLECTION, HASH_FILE_PATH, MANIFEST_PATH, PDF_STORE, CHUNK_STORE_LOCK_PATH,
+    NEAR_DUPLICATE_INDEX_PATH, NEAR_DUPLICATE_THRESHOLD, MINHASH_PERMUTATIONS,
+    EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_QUANTIZATION,
+    WATCH_SETTLE_SECONDS, CHUNK_LENGTH_UNIT, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_OVERLAP_TOKENS, EMBED_BATCH_SIZE, WRITE_BATCH_SIZE, INGEST_WORKERS, PAGE_SHARD_SIZE, INCREMENTAL_MAX_CHANGED_PAGES
+)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Setup the ChromaDB client and collection
-chromadb_client = chromadb.PersistentClient(path=CHROMADB_PATH)
-collection = chromadb_client.get_or_create_collection(DB_COLLECTION)
+extractor = get_extractor()
+
+separators = [
+    "\n\n",
+    "\n",
+    ".",
+    " ",
+    ""
+]
+if CHUNK_LENGTH_UNIT not in ("tokens", "characters"):
+    raise ValueError(f"Unknown chunk length unit: {CHUNK_LENGTH_UNIT}")
+
+# The database, the page cache, the embedding model and what depends on them are built on first use, so
+# a run that finds nothing to ingest never imports ChromaDB or the model's runtime or loads the model.
+
+@functools.lru_cache(maxsize=None)
+def get_collection() -> "chromadb.Collection":
+    """
+    Open the ChromaDB collection.
+    """
+    import chromadb
+
+    chromadb_client = chromadb.PersistentClient(path=CHROMADB_PATH)
+    return chromadb_client.get_or_create_collection(DB_COLLECTION)
+
+@functools.lru_cache(maxsize=None)
+def get_page_cache() -> PageCache:
+    """
+    Open the page cache of the configured extractor.
+    """
+    return PageCache(extractor.name)
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_model() -> EmbeddingBackend:
+    """
+    Download/load the embedding model with the configured backend.
+    """
+    return create_embedding_backend()
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_cache() -> EmbeddingCache:
+    embedding_model = get_embedding_model()
+    return EmbeddingCache(embedding_model.cache_name, embedding_model.dimension)
+
+@functools.lru_cache(maxsize=None)
+def get_chunk_store() -> ChunkStore:
+    """
+    Open the chunk store, first adding any stored chunks missing from the near-duplicate index.
+    """
+    near_duplicates = None
+    if NEAR_DUPLICATE_THRESHOLD is not None:
+        near_duplicates = NearDuplicateIndex(NEAR_DUPLICATE_INDEX_PATH, NEAR_DUPLICATE_THRESHOLD, MINHASH_PERMUTATIONS)
+    embedding_model = get_embedding_model()
+    chunk_store = ChunkStore(
+        get_collection(), embedding_model.dimension, near_duplicates, CHUNK_STORE_LOCK_PATH, embedding_model.cache_name
+    )
+    chunk_store.index_near_duplicates()
+    return chunk_store
+
+class Chunking(NamedTuple):
+    """
+    The text splitter, its settings as recorded in the manifest (files chunked with other
+    settings are re-ingested in full) and how many characters of streamed page text are
+    buffered before splitting.
+    """
+    splitter: Any  # RecursiveTextSplitter or TokenAwareTextSplitter
+    settings: str
+    split_window: int
+
+@functools.lru_cache(maxsize=None)
+def get_chunking() -> Chunking:
+    """
+    Build the text splitter for CHUNK_LENGTH_UNIT. Token chunking loads the embedding model
+    for its tokenizer and maximum sequence length.
+    """
+    if CHUNK_LENGTH_UNIT == "tokens":
+        embedding_model = get_embedding_model()
+        # Leave room for the special tokens the model adds around every chunk
+        chunk_tokens = embedding_model.max_seq_length - embedding_model.special_tokens
+        text_splitter = TokenAwareTextSplitter(embedding_model.tokenizer, chunk_tokens, CHUNK_OVERLAP_TOKENS, separators)
+        # A token is a few characters
+        return Chunking(text_splitter, f"tokens:{chunk_tokens}/{CHUNK_OVERLAP_TOKENS}", 64 * chunk_tokens)
+    return Chunking(
+        RecursiveTextSplitter(CHUNK_SIZE, CHUNK_OVERLAP, separators), f"characters:{CHUNK_SIZE}/{CHUNK_OVERLAP}", 16 * CHUNK_SIZE
+    )
+
+def is_loaded(getter: Callable[[], Any]) -> bool:
+    """
+    Check whether one of the getters above has built its object yet.
+    """
+    return getter.cache_info().currsize > 0
+
+# Files are hashed in blocks of this size
+HASH_BLOCK_SIZE = 1024 * 1024
 
-# Download/setup the embedding model
-embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+# Version of how chunks are stored in ChromaDB: 2 stores each distinct chunk text once,
+# under its content hash. Files stored with an older layout are re-ingested.
+STORAGE_VERSION = 2
+
+# The embedding model variant chunks are embedded with. Files embedded with another one are
+# re-ingested, which replaces their vectors, so that chunks and queries are embedded alike.
+EMBEDDING_VARIANT = cache_name(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_QUANTIZATION)
+
+class Chunk(NamedTuple):
+    """
+    A chunk of text, the first and last page it was taken from, and its character span:
+    start_offset into the text of its first page and end_offset (exclusive) into its last.
+    """
+    text: str
+    page_start: int
+    page_end: int
+    start_offset: int
+    end_offset: int
+
+class Replacement(NamedTuple):
+    """
+    New chunks replacing the stored chunks [first_chunk, end_chunk) of a changed PDF.
+    """
+    first_chunk: int
+    end_chunk: int
+    chunks: List[Chunk]
 
 def confirm_project_paths() -> None:
     """
@@ -26,116 +164,947 @@ def confirm_project_paths() -> None:
     """
     logging.info("Checking project paths...")
 
-    if not os.path.exists(HASH_FILE_PATH):
-        logging.info(f"{HASH_FILE_PATH} does not exist. Creating now.")
-        with open(HASH_FILE_PATH, "w") as f:
-            f.write("{}")
-    else:
-        logging.info(f"{HASH_FILE_PATH} exists. Skipping.")
-
     if not os.path.exists(PDF_STORE):
         logging.info(f"{PDF_STORE} does not exist. Creating now.")
         os.makedirs(PDF_STORE)
     else:
         logging.info(f"{PDF_STORE} exists. Skipping.")
 
-def load_processed_files() -> Dict[str, str]:
+def load_processed_files() -> Manifest:
     """
-    Load the dictionary of processed file hashes from a JSON file.
+    Open the processed files manifest, importing the JSON manifest of older versions on first use.
     """
     logging.info("Loading list of processed files.")
-    if os.path.exists(HASH_FILE_PATH):
-        with open(HASH_FILE_PATH, "r") as f:
-            return json.load(f)
-    return {}
+    return Manifest(MANIFEST_PATH, HASH_FILE_PATH)
+
+def hash_file(file: str, *algorithms: str) -> List[str]:
+    """
+    Hash a file with one or more algorithms in a single pass, reading it in fixed-size blocks.
+    """
+    hashers = [
+        hashlib.blake2b(digest_size=16) if algorithm == "blake2b" else hashlib.new(algorithm)
+        for algorithm in algorithms
+    ]
+    buffer = bytearray(HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(file, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            for hasher in hashers:
+                hasher.update(view[:n])
+    return [hasher.hexdigest() for hasher in hashers]
 
 def compute_file_hash(file: str) -> str:
     """
-    Compute the MD5 hash of a file.
+    Compute the SHA-256 hash of a file, which CPUs with SHA extensions compute about twice
+    as fast as MD5 or BLAKE2b.
     """
-    hasher = hashlib.md5()
-    with open(file, "rb") as f:
-        hasher.update(f.read())
-    return hasher.hexdigest()
+    return hash_file(file, "sha256")[0]
 
-def extract_text_from_pdf(file: str) -> str:
+def make_file_record(
+    file_hash: str,
+    stat: os.stat_result,
+    page_hashes: Optional[List[str]] = None,
+    chunk_records: Optional[List[List[Any]]] = None,
+    ingest_seconds: Optional[float] = None
+) -> Dict[str, Any]:
     """
-    Extract text and tables from a PDF file.
+    Build the manifest entry for a file from its hash, stat information and, once
+    ingested, its page hashes, chunk records, the extractor, chunk settings and embedding
+    variant that produced them and how long ingesting it took.
+    """
+    record = {"hash": file_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "inode": stat.st_ino}
+    if page_hashes is not None and chunk_records is not None:
+        record["pages"] = page_hashes
+        record["chunks"] = chunk_records
+        record["extractor"] = extractor.name
+        record["format"] = EXTRACTION_VERSION
+        record["storage"] = STORAGE_VERSION
+        record["chunking"] = get_chunking().settings
+        record["embedding"] = EMBEDDING_VARIANT
+    if ingest_seconds is not None:
+        record["ingest_seconds"] = round(ingest_seconds, 3)
+    return record
+
+def update_file_record(record: FileRecord, file_hash: str, stat: os.stat_result) -> Dict[str, Any]:
+    """
+    Refresh the hash and stat information of a manifest entry whose content is unchanged.
+    """
+    if not isinstance(record, dict):
+        return make_file_record(file_hash, stat)
+    return {**record, **make_file_record(file_hash, stat)}
+
+def record_is_current(record: Optional[FileRecord]) -> bool:
+    """
+    Check whether a manifest entry's chunks have the current text format, storage layout and
+    embedding variant. Files ingested otherwise are re-ingested even if they are unchanged.
+    Entries written before the embedding variant was recorded were embedded in float32.
+    """
+    return (
+        isinstance(record, dict)
+        and record.get("format") == EXTRACTION_VERSION
+        and record.get("storage") == STORAGE_VERSION
+        and record.get("embedding", EMBEDDING_MODEL_NAME) == EMBEDDING_VARIANT
+    )
+
+def stat_matches(record: Optional[FileRecord], stat: os.stat_result) -> bool:
+    """
+    Check whether a file's stat information matches its manifest entry, meaning it is unchanged.
     """
-    text = ""
+    return (
+        isinstance(record, dict)
+        and record.get("size") == stat.st_size
+        and record.get("mtime_ns") == stat.st_mtime_ns
+        and record.get("inode") == stat.st_ino
+    )
+
+def check_file_hash(file: str, record: Optional[FileRecord]) -> Tuple[str, bool]:
+    """
+    Hash a file and compare it with its manifest entry.
+    Returns the file hash and whether the content is unchanged. Entries from older
+    manifests hold an MD5 digest, or a 128-bit BLAKE2b one, which is computed in the same
+    pass to compare against. An entry whose BLAKE2b digest still matches keeps it, since
+    its pages are cached under that digest.
+    """
+    if isinstance(record, str):
+        file_hash, legacy_hash = hash_file(file, "sha256", "md5")
+        return file_hash, legacy_hash == record
+
+    previous_hash = record.get("hash") if isinstance(record, dict) else None
+    if previous_hash is not None and len(previous_hash) == 2 * 16:
+        file_hash, blake2b_hash = hash_file(file, "sha256", "blake2b")
+        if blake2b_hash == previous_hash:
+            return previous_hash, True
+        return file_hash, False
+
+    file_hash = compute_file_hash(file)
+    return file_hash, previous_hash == file_hash
+
+def find_changed_files(
+    files: List[str],
+    processed_files: Mapping[str, FileRecord]
+) -> List[Tuple[str, os.stat_result]]:
+    """
+    Return the files (with their stat information) whose size, mtime or inode differ from
+    the manifest. Files with matching stat information are skipped without being read,
+    unless they were ingested with an older text format.
+    """
+    changed = []
+    for file_path in files:
+        stat = os.stat(file_path)
+        record = processed_files.get(file_path)
+        if stat_matches(record, stat) and record_is_current(record):
+            logging.debug(f"No changes detected in {os.path.basename(file_path)}. Skipping.")
+        else:
+            changed.append((file_path, stat))
+
+    logging.info(f"{len(files) - len(changed)} of {len(files)} files unchanged since the last run.")
+    return changed
+
+def format_page(content: PageContent) -> str:
+    """
+    Render extracted page content as text, ending in a line break so it does not run
+    into the next page. Chunks may span pages; their page span is kept as metadata.
+    """
+    return content.text + content.table_text + "\n"
+
+def hash_pdf_object(obj: Any, digests: Dict[int, bytes]) -> bytes:
+    """
+    Digest of a PDF object and everything it references: dictionaries, arrays and the raw
+    (still encoded) data of streams. digests holds the digest of each indirect object seen
+    so far, so objects that several pages share (fonts, images, forms) are hashed once per
+    file; a reference cycle is cut at the object it comes back to.
+    """
+    if isinstance(obj, PDFObjRef):
+        if obj.objid not in digests:
+            digests[obj.objid] = b""
+            digests[obj.objid] = hash_pdf_object(resolve1(obj), digests)
+        return digests[obj.objid]
+
+    hasher = hashlib.blake2b(digest_size=16)
+    if isinstance(obj, PDFStream):
+        hasher.update(hash_pdf_object(obj.attrs, digests))
+        hasher.update(obj.get_rawdata() or obj.get_data())
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            hasher.update(str(key).encode())
+            hasher.update(hash_pdf_object(obj[key], digests))
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            hasher.update(hash_pdf_object(item, digests))
+    else:
+        hasher.update(repr(obj).encode())
+    return hasher.digest()
+
+def compute_page_hashes(file: str) -> List[str]:
+    """
+    Hash the raw content streams and the resources of each page of a PDF file.
+    The resources are hashed with everything they reference, so text drawn through Form
+    XObjects and changed fonts or images change the page hash too.
+    This needs no layout analysis, so it is far cheaper than extracting the pages.
+    """
+    page_hashes = []
+    digests: Dict[int, bytes] = {}
     with pdfplumber.open(file) as pdf:
-        for i, page in enumerate(pdf.pages):
-            page_text = page.extract_text() or ""
-            tables = page.extract_tables() or []
+        for page in pdf.pages:
+            hasher = hashlib.blake2b(digest_size=8)
+            hasher.update(repr(page.mediabox).encode())
+            for stream in page.page_obj.contents:
+                hasher.update(resolve1(stream).get_data())
+            hasher.update(hash_pdf_object(page.page_obj.resources, digests))
+            page_hashes.append(hasher.hexdigest())
+    return page_hashes
+
+def page_ranges(page_count: int, shard_size: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Split a page count into consecutive [start, end) page ranges of at most shard_size
+    (by default PAGE_SHARD_SIZE) pages.
+    """
+    shard_size = shard_size or PAGE_SHARD_SIZE
+    return [(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)]
+
+def format_pages(pages: Iterable[PageContent]) -> Iterator[Tuple[int, str]]:
+    """
+    Yield the page number and formatted text of each extracted page.
+    """
+    return ((content.page_number, format_page(content)) for content in pages)
+
+def extract_page_range(file: str, start: int, end: Optional[int] = None) -> List[PageContent]:
+    """
+    Extract the content of each of the pages [start, end) (0-based) of a PDF file.
+    """
+    return list(extractor.iter_pages(file, start, end))
+
+def iter_page_contents(file: str, workers: int = 1, page_count: Optional[int] = None) -> Iterator[PageContent]:
+    """
+    Yield the extracted content of each page of a PDF file in page order.
 
-            table_text = ""
-            for table in tables:
-                formatted = "\n".join([
-                    " | ".join(cell or "" for cell in row)
-                    for row in table if any((cell or "").strip() for cell in row)
-                ])
-                table_text += f"\n[Page {i+1} Table]\n{formatted}\n"
+    With more than one worker, PDFs longer than one shard are split into page ranges
+    that are extracted in parallel processes and yielded back in page order.
+    """
+    ranges: List[Tuple[int, int]] = []
+    if workers > 1:
+        if page_count is None:
+            page_count = extractor.page_count(file)
+        ranges = page_ranges(page_count)
+    if len(ranges) <= 1:
+        yield from extractor.iter_pages(file)
+        return
+
+    # This runs in the ingestion pipeline's source thread while the other stages run, and
+    # forking a multithreaded process can deadlock the child on a lock another thread held.
+    # The forkserver forks workers from a single-threaded server process instead.
+    context = multiprocessing.get_context("forkserver")
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=context) as executor:
+        for pages in executor.map(extract_page_range, [file] * len(ranges), *zip(*ranges)):
+            yield from pages
+
+def iter_page_texts(
+    file: str,
+    workers: int = 1,
+    page_count: Optional[int] = None,
+    file_hash: Optional[str] = None
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield the page number and formatted text of each page of a PDF file in page order.
+    Given the file's hash, the pages are read from the page cache without parsing the PDF
+    if it holds them, and added to it otherwise.
+    """
+    if file_hash is not None and get_page_cache().contains(file_hash):
+        return format_pages(get_page_cache().iter_pages(file_hash))
+
+    pages = iter_page_contents(file, workers, page_count)
+    if file_hash is not None:
+        pages = get_page_cache().store(file_hash, pages)
+    return format_pages(pages)
+
+def extract_text_from_pdf(file: str, workers: int = 1) -> str:
+    """
+    Extract text and tables from a PDF file.
+    The result is identical whether or not the file is extracted in page-range shards.
+    """
+    return "".join(text for _, text in iter_page_texts(file, workers)).strip()
+
+def split_pages(pages: Iterable[Tuple[int, str]], start_offset: int = 0) -> Iterator[Chunk]:
+    """
+    Split a stream of (page number, page text) into overlapping chunks without holding the whole book.
+    Splitting starts start_offset characters into the first page.
+
+    Pages are buffered until the chunking's split window of characters is available. The buffer is then split,
+    every chunk but the last is yielded, and the buffer restarts at the last chunk so that
+    the next split continues from it with the usual separators and overlap. The buffer offset
+    of every page is tracked, and the splitter reports the offset of every chunk, so each
+    chunk carries the pages it spans and its offsets into their text.
+    """
+    text_splitter, _, split_window = get_chunking()
+    buffer = ""
+    page_offsets: List[int] = []
+    page_numbers: List[int] = []
 
-            text += page_text + table_text + f"\n(Page {i + 1})\n"
-    return text.strip()
+    def locate(split: List[Tuple[int, str]]) -> List[Tuple[int, Chunk]]:
+        located = []
+        for offset, text in split:
+            end = offset + len(text)
+            first = bisect.bisect_right(page_offsets, offset) - 1
+            last = bisect.bisect_right(page_offsets, end - 1) - 1
+            located.append((offset, Chunk(
+                text, page_numbers[first], page_numbers[last], offset - page_offsets[first], end - page_offsets[last]
+            )))
+        return located
 
-def save_processed_files(processed_files_data: Dict[str, str]) -> None:
+    for page_number, page_text in pages:
+        page_offsets.append(len(buffer) - start_offset)
+        page_numbers.append(page_number)
+        buffer += page_text[start_offset:]
+        start_offset = 0
+        if len(buffer) < split_window:
+            continue
+
+        located = locate(text_splitter.split_text_with_offsets(buffer))
+        if len(located) < 2:
+            continue
+        for _, chunk in located[:-1]:
+            yield chunk
+
+        cut = located[-1][0]
+        buffer = buffer[cut:]
+        first_kept = bisect.bisect_right(page_offsets, cut) - 1
+        # The first kept page started before the cut, so its offset becomes negative
+        page_offsets = [offset - cut for offset in page_offsets[first_kept:]]
+        page_numbers = page_numbers[first_kept:]
+
+    for _, chunk in locate(text_splitter.split_text_with_offsets(buffer)):
+        yield chunk
+
+def chunk_occurrence(file: str, chunk_index: int, chunk: Chunk) -> Occurrence:
+    """
+    Where a chunk occurs: its source, position and page span.
     """
-    Save the updated dictionary of processed file hashes to a JSON file.
+    return {
+        "source": file,
+        "chunk_index": chunk_index,
+        "page_start": chunk.page_start,
+        "page_end": chunk.page_end,
+        "start_offset": chunk.start_offset,
+        "end_offset": chunk.end_offset
+    }
+
+def chunk_record(chunk: Chunk, stored_key: str) -> List[Any]:
+    """
+    Manifest record of a chunk stored under stored_key.
     """
-    with open(HASH_FILE_PATH, "w") as f:
-        json.dump(processed_files_data, f)
+    key = chunk_key(chunk.text)
+    record = [chunk.page_start, chunk.page_end, key, chunk.start_offset, chunk.end_offset]
+    if stored_key != key:
+        record.append(stored_key)
+    return record
 
-def chunk_and_store_pdf(file: str) -> None:
+def stored_key(record: List[Any]) -> str:
+    """
+    Key of the stored chunk that a chunk record's chunk is an occurrence of.
+    """
+    return record[5] if len(record) > 5 else record[2]
+
+def record_occurrences(file: str, chunk_records: List[List[Any]]) -> Dict[str, List[Occurrence]]:
+    """
+    The occurrences of a PDF file's chunks given their records, grouped by stored chunk key.
+    """
+    occurrences: Dict[str, List[Occurrence]] = {}
+    for chunk_index, record in enumerate(chunk_records):
+        page_start, page_end, _, start_offset, end_offset = record[:5]
+        occurrences.setdefault(stored_key(record), []).append({
+            "source": file,
+            "chunk_index": chunk_index,
+            "page_start": page_start,
+            "page_end": page_end,
+            "start_offset": start_offset,
+            "end_offset": end_offset
+        })
+    return occurrences
+
+def embed_batches(chunks: Iterable[Chunk]) -> Iterator[Tuple[List[Chunk], Any]]:
+    """
+    Group chunks into batches of EMBED_BATCH_SIZE and yield each batch with its embeddings.
+    The embedding model sorts each batch into batches of similar token lengths of its own.
+    """
+    chunk_iter = iter(chunks)
+    while True:
+        batch = list(itertools.islice(chunk_iter, EMBED_BATCH_SIZE))
+        if not batch:
+            return
+        yield batch, get_embedding_cache().encode([chunk.text for chunk in batch], get_embedding_model().encode)
+
+def write_chunks(file: str, batches: Iterable[Tuple[List[Chunk], Any]], first_index: int = 0) -> List[List[Any]]:
+    """
+    Store embedded chunk batches of a PDF file in the chunk store, numbered from first_index.
+    Batches are coalesced into writes of at least WRITE_BATCH_SIZE chunks. Returns their
+    chunk records.
+    """
+    chunk_records: List[List[Any]] = []
+    pending: List[Tuple[Chunk, Any]] = []
+
+    def flush() -> None:
+        if pending:
+            first = first_index + len(chunk_records)
+            stored_keys = get_chunk_store().add([
+                (chunk.text, embedding, chunk_occurrence(file, first + i, chunk))
+                for i, (chunk, embedding) in enumerate(pending)
+            ])
+            chunk_records.extend(chunk_record(chunk, key) for (chunk, _), key in zip(pending, stored_keys))
+            pending.clear()
+
+    for batch, batch_embeddings in batches:
+        pending.extend(zip(batch, batch_embeddings))
+        if len(pending) >= WRITE_BATCH_SIZE:
+            flush()
+    flush()
+
+    logging.info(f"Stored {len(chunk_records)} chunks from {file} in ChromaDB")
+    return chunk_records
+
+def store_chunks(file: str, chunks: Iterable[Chunk], first_index: int = 0) -> List[List[Any]]:
+    """
+    Generate embeddings for the chunks of a PDF file and store them in ChromaDB.
+    Embedding runs in its own thread, overlapped with the ChromaDB writes in this one.
+    Returns the records of the stored chunks.
+    """
+    name = os.path.basename(file)
+    batches = run_pipeline(name, ("chunks", chunks), [("embed", embed_batches)])
+    return write_chunks(file, batches, first_index)
+
+def chunk_and_store_pdf(
+    file: str,
+    workers: int = 1,
+    page_count: Optional[int] = None,
+    file_hash: Optional[str] = None
+) -> List[List[Any]]:
     """
     Split text from a PDF file into chunks, generate embeddings, and store them in ChromaDB.
+
+    Extraction, splitting, embedding and the ChromaDB writes run concurrently as a pipeline
+    connected by bounded queues. Pages are read from and added to the page cache when the
+    file's hash is given. Returns the records of the stored chunks.
     """
-    text = extract_text_from_pdf(file)
-
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=768,
-        chunk_overlap=100,
-        separators=[
-            "\n\n",
-            "\n",
-            ".",
-            " ",
-            ""
-        ]
+    name = os.path.basename(file)
+    batches = run_pipeline(
+        name,
+        ("extract", iter_page_texts(file, workers, page_count, file_hash)),
+        [("split", split_pages), ("embed", embed_batches)]
     )
+    return write_chunks(file, batches)
 
-    chunks = splitter.split_text(text)
-    embeddings = embedding_model.encode(chunks)
+def list_pdf_files() -> List[str]:
+    """
+    List the paths of all PDF files in the PDF store.
+    """
+    return [
+        os.path.join(PDF_STORE, file_name)
+        for file_name in os.listdir(PDF_STORE)
+        if file_name.lower().endswith(".pdf")
+    ]
 
-    ids = []
-    metadata = []
+def remove_stale_chunks(file: str, record: Optional[FileRecord], chunk_records: List[List[Any]]) -> int:
+    """
+    Remove the occurrences of a previous version of a PDF file that the new version no
+    longer has, deleting stored chunks that no other file shares.
 
-    for i, chunk in enumerate(chunks):
-        chunk_id = f"{os.path.basename(file)}_chunk_{i}"
-        ids.append(chunk_id)
-        metadata.append({"source": file, "chunk_index": i})
+    Called after the new chunks have been stored, so a re-ingested file is replaced without
+    ever disappearing from search. The chunks to update are the ones in the manifest entry,
+    so no collection scan is needed. Entries written before chunks were deduplicated only
+    know the file, so its old chunks are looked up by source instead.
+    Returns the number of chunks deleted.
+    """
+    # Only the storage layout matters here: entries that are out of date for another reason
+    # (extraction format, embedding variant) still list their stored chunks
+    if isinstance(record, dict) and record.get("storage") == STORAGE_VERSION and "chunks" in record:
+        old_keys = [stored_key(chunk) for chunk in record["chunks"]]
+        removed = get_chunk_store().set_source(file, old_keys, record_occurrences(file, chunk_records))
+    elif record is not None:
+        removed = get_chunk_store().remove_legacy(file)
+    else:
+        removed = 0
 
-    collection.add(ids=ids, documents=chunks, embeddings=embeddings, metadatas=metadata)
-    logging.info(f"Stored {len(chunks)} chunks from {file} in ChromaDB")
+    if removed:
+        logging.info(f"Removed {removed} stale chunks of {file} from ChromaDB")
+    return removed
 
-if __name__ == "__main__":
-    confirm_project_paths()
-    processed_files = load_processed_files()
-    logging.info(f"Processed files: {processed_files}")
+def remove_files(files: Iterable[str], processed_files: Manifest) -> None:
+    """
+    Delete the chunks of PDF files that have been removed from the PDF store and drop their manifest entries.
+    """
+    for file_path in files:
+        if file_path not in processed_files:
+            continue
+        logging.info(f"{os.path.basename(file_path)} was removed from the PDF store. Deleting its chunks.")
+        remove_stale_chunks(file_path, processed_files[file_path], [])
+        del processed_files[file_path]
 
-    for file_name in os.listdir(PDF_STORE):
-        file_path = os.path.join(PDF_STORE, file_name)
+def remove_deleted_files(files: List[str], processed_files: Manifest) -> None:
+    """
+    Remove every manifest entry whose file is no longer in the PDF store, along with its chunks.
+    """
+    present = set(files)
+    remove_files([path for path in processed_files if path not in present], processed_files)
 
-        if not file_name.lower().endswith(".pdf"):
-            continue
+def plan_page_update(record: Optional[FileRecord], page_hashes: List[str]) -> Optional[List[int]]:
+    """
+    Compare the page hashes of a changed PDF file with its manifest entry.
+    Returns the changed page numbers, or None if the file must be re-ingested in full
+    because there is no usable previous entry, it was extracted or chunked with a different
+    text format or settings, the page count changed, too many pages changed or no page did
+    (the change is somewhere the page hashes do not cover).
+    """
+    if not isinstance(record, dict) or not record.get("chunks") or "pages" not in record:
+        return None
+    # Entries written before the extractor was recorded were extracted with pdfplumber
+    if not record_is_current(record):
+        return None
+    if record.get("extractor", "pdfplumber") != extractor.name or record.get("chunking") != get_chunking().settings:
+        return None
+
+    old_hashes = record["pages"]
+    if len(old_hashes) != len(page_hashes):
+        return None
+
+    changed = [i + 1 for i, (old, new) in enumerate(zip(old_hashes, page_hashes)) if old != new]
+    if not changed or len(changed) > INCREMENTAL_MAX_CHANGED_PAGES * len(page_hashes):
+        return None
+    return changed
+
+def extract_changed_pages(
+    file: str,
+    chunk_records: List[List[Any]],
+    changed_pages: List[int]
+) -> Tuple[List[Replacement], List[PageContent]]:
+    """
+    Re-extract and re-chunk the regions of a PDF file around its changed pages.
+    Returns the replacements and every page that was extracted for them.
+
+    A region starts where the chunk before the first chunk touching a changed page starts,
+    so that neighbouring chunk window is rebuilt too. Pages are then streamed through the
+    splitter from there until a new chunk past the changed pages matches a stored chunk
+    (same text, start page and offset on that page): from there on the old chunks are still
+    valid and are kept. Changed pages reached before such a match are absorbed into the region.
+    """
+    starts = [record[0] for record in chunk_records]
+    ends = [record[1] for record in chunk_records]
+    positions: Dict[Tuple[int, int, str], int] = {}
+    for j, (page_start, _, key, start_offset, *_) in enumerate(chunk_records):
+        positions[(page_start, start_offset, key)] = j
+
+    def region_start(page: int) -> Tuple[int, int, int]:
+        # Start at the chunk before the first one touching the page: its page, chunk index and offset
+        neighbour = max(0, bisect.bisect_left(ends, page) - 1)
+        if not chunk_records or page < starts[neighbour]:
+            return page, bisect.bisect_left(starts, page), 0
+        return starts[neighbour], neighbour, chunk_records[neighbour][3]
+
+    replacements: List[Replacement] = []
+    extracted: List[PageContent] = []
+
+    def extract_from(page: int) -> Iterator[Tuple[int, str]]:
+        for content in extractor.iter_pages(file, page - 1):
+            extracted.append(content)
+            yield content.page_number, format_page(content)
+
+    i = 0
+    while i < len(changed_pages):
+        first_page, first_chunk, start_offset = region_start(changed_pages[i])
+        next_start = region_start(changed_pages[i + 1])[1] if i + 1 < len(changed_pages) else len(chunk_records)
+        new_chunks: List[Chunk] = []
+        end_chunk = len(chunk_records)
+
+        for chunk in split_pages(extract_from(first_page), start_offset):
+            while i + 1 < len(changed_pages) and chunk.page_end >= changed_pages[i + 1]:
+                i += 1
+                next_start = region_start(changed_pages[i + 1])[1] if i + 1 < len(changed_pages) else len(chunk_records)
+
+            if chunk.page_start > changed_pages[i]:
+                match = positions.get((chunk.page_start, chunk.start_offset, chunk_key(chunk.text)))
+                if match is not None and first_chunk <= match < next_start:
+                    end_chunk = match
+                    break
+            new_chunks.append(chunk)
+
+        replacements.append(Replacement(first_chunk, end_chunk, new_chunks))
+        i += 1
+        # Changed pages inside the rebuilt region need no region of their own
+        while i < len(changed_pages) and region_start(changed_pages[i])[1] < end_chunk:
+            i += 1
+
+    return replacements, extracted
+
+def update_page_cache(
+    old_hash: str,
+    file_hash: str,
+    changed_pages: List[int],
+    extracted: List[PageContent]
+) -> None:
+    """
+    Write the page cache entry of a PDF file updated page by page: the entry of its previous
+    version with the re-extracted pages in place of the cached ones. Nothing is written if
+    the previous version is not cached or a changed page was not re-extracted.
+    """
+    page_cache = get_page_cache()
+    replaced = {content.page_number: content for content in extracted}
+    if not page_cache.contains(old_hash) or page_cache.contains(file_hash) or not set(changed_pages) <= replaced.keys():
+        return
+    pages = (replaced.get(content.page_number, content) for content in page_cache.iter_pages(old_hash))
+    for _ in page_cache.store(file_hash, pages):
+        pass
+
+def apply_replacements(file: str, chunk_records: List[List[Any]], replacements: List[Replacement]) -> List[List[Any]]:
+    """
+    Store re-chunked regions of a PDF file in the chunk store in place of the chunks they replace.
+
+    New chunks are embedded and stored, and the occurrences of the replaced chunks are
+    removed, deleting chunks that no other file shares. Chunks outside the regions keep
+    their embeddings and page spans; only the chunk_index of their occurrences is
+    renumbered when a region's chunk count changed.
+    Returns the records of all chunks of the file.
+    """
+    new_records: List[List[Any]] = []
+    kept: List[Tuple[int, int]] = []  # (new index, old index) of chunks outside the regions
+    replaced_keys = set()
+    position = 0
+
+    for replacement in replacements:
+        for j in range(position, replacement.first_chunk):
+            kept.append((len(new_records), j))
+            new_records.append(chunk_records[j])
+        replaced_keys.update(stored_key(chunk) for chunk in chunk_records[replacement.first_chunk:replacement.end_chunk])
+        new_records.extend(store_chunks(file, replacement.chunks, first_index=len(new_records)))
+        position = replacement.end_chunk
+
+    for j in range(position, len(chunk_records)):
+        kept.append((len(new_records), j))
+        new_records.append(chunk_records[j])
+
+    # Occurrences of the file in these chunks are rewritten from the new records
+    renumbered_keys = {stored_key(chunk_records[old]) for new, old in kept if new != old}
+    removed = get_chunk_store().set_source(file, replaced_keys | renumbered_keys, record_occurrences(file, new_records))
+
+    rewritten = len(new_records) - len(kept)
+    logging.info(
+        f"Re-ingested changed pages of {file}: {len(kept)} chunks kept, "
+        f"{rewritten} rewritten, {removed} removed"
+    )
+    return new_records
 
-        file_hash = compute_file_hash(file_path)
+def ingest_file(
+    file: str,
+    record: Optional[FileRecord],
+    file_hash: str,
+    stat: os.stat_result,
+    workers: int = 1
+) -> Dict[str, Any]:
+    """
+    Ingest a new or changed PDF file and return its new manifest entry.
+    Only the regions around changed pages are re-ingested when the previous entry allows it.
+    """
+    start = time.perf_counter()
+    page_hashes = compute_page_hashes(file)
+    changed_pages = plan_page_update(record, page_hashes)
+
+    if changed_pages is None:
+        chunk_records = chunk_and_store_pdf(file, workers, len(page_hashes), file_hash)
+        remove_stale_chunks(file, record, chunk_records)
+    else:
+        replacements, extracted = extract_changed_pages(file, record["chunks"], changed_pages)
+        chunk_records = apply_replacements(file, record["chunks"], replacements)
+        update_page_cache(record["hash"], file_hash, changed_pages, extracted)
+    return make_file_record(file_hash, stat, page_hashes, chunk_records, time.perf_counter() - start)
+
+def hash_file_and_pages(file: str, record: Optional[FileRecord]) -> Tuple[str, Optional[List[str]]]:
+    """
+    Worker task: hash a PDF file and, if its content changed, hash each of its pages.
+    Returns the file hash and the page hashes (None if the content and text format are unchanged).
+    """
+    file_hash, unchanged = check_file_hash(file, record)
+    if unchanged and record_is_current(record):
+        return file_hash, None
+    return file_hash, compute_page_hashes(file)
+
+def extract_and_chunk(file: str, file_hash: Optional[str] = None) -> List[Chunk]:
+    """
+    Worker task: extract (or read from the page cache) and chunk the text of a whole PDF file.
+    """
+    return list(split_pages(iter_page_texts(file, file_hash=file_hash)))
+
+def chunk_page_ranges(parts: List[List[PageContent]], file_hash: Optional[str] = None) -> List[Chunk]:
+    """
+    Worker task: chunk the pages of consecutive page-range shards, adding them to the page cache.
+    """
+    pages = itertools.chain.from_iterable(parts)
+    if file_hash is not None:
+        pages = get_page_cache().store(file_hash, pages)
+    return list(split_pages(format_pages(pages)))
+
+def ingest_serial(files: List[str], processed_files: Manifest, workers: int = 1) -> None:
+    """
+    Hash, extract, chunk, embed and store each changed PDF file one after another.
+    Large files are still extracted in page-range shards when workers > 1.
+    """
+    for file_path, stat in find_changed_files(files, processed_files):
+        file_name = os.path.basename(file_path)
+        record = processed_files.get(file_path)
+        file_hash, unchanged = check_file_hash(file_path, record)
 
-        if processed_files.get(file_path) == file_hash:
+        if unchanged and record_is_current(record):
             logging.info(f"No changes detected in {file_name}. Skipping.")
+            processed_files[file_path] = update_file_record(record, file_hash, stat)
         else:
             logging.info(f"Processing new or updated file: {file_name}")
-            chunk_and_store_pdf(file_path)
-            processed_files[file_path] = file_hash
+            processed_files[file_path] = ingest_file(file_path, record, file_hash, stat, workers)
+
+def ingest_parallel(files: List[str], processed_files: Manifest, workers: int) -> None:
+    """
+    Hash, extract and chunk changed PDF files in a pool of worker processes.
+
+    Each changed file is extracted as a whole, or, if it is longer than one shard, as
+    page-range shards spread over the pool and chunked once all shards are back. Files
+    with only a few changed pages have just the regions around those pages re-extracted.
+    The main process is the single writer: it embeds the chunks and stores them in the
+    ChromaDB collection as files finish, in whatever order that happens. A file is only
+    recorded in the manifest once its chunks are stored, so failures and files cut short
+    by a crash are retried on the next run. New files are only started while fewer than two tasks per worker are in
+    flight, which bounds the memory held by finished-but-not-yet-stored results.
+    """
+    pending_files = find_changed_files(files, processed_files)
+    if not pending_files:
+        return
+    # Fork so that workers inherit the loaded modules and the text splitter instead of
+    # re-importing this script. The splitter is built first: with token chunking it needs
+    # the embedding model, which would otherwise be loaded again in every worker. Workers
+    # never open the database.
+    get_chunking()
+    context = multiprocessing.get_context("fork")
+    tasks = {}  # future -> (task kind, file path, shard index)
+    stats: Dict[str, os.stat_result] = {}
+    started: Dict[str, float] = {}
+    file_hashes: Dict[str, str] = {}
+    page_hashes: Dict[str, List[str]] = {}
+    changed_pages: Dict[str, List[int]] = {}
+
+    shards: Dict[str, List[Optional[List[Tuple[int, str]]]]] = {}
+
+    def forget(file_path: str) -> None:
+        for state in (stats, started, file_hashes, page_hashes, changed_pages, shards):
+            state.pop(file_path, None)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        def submit(kind: str, file_path: str, fn, *args, index: int = 0) -> None:
+            tasks[executor.submit(fn, *args)] = (kind, file_path, index)
+
+        while pending_files or tasks:
+            while pending_files and len(tasks) < workers * 2:
+                file_path, stat = pending_files.pop(0)
+                stats[file_path] = stat
+                started[file_path] = time.perf_counter()
+                submit("hash", file_path, hash_file_and_pages, file_path, processed_files.get(file_path))
+
+            done, _ = wait(tasks, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, file_path, index = tasks.pop(future)
+                file_name = os.path.basename(file_path)
+                try:
+                    result = future.result()
+                except Exception:
+                    logging.exception(f"Failed to extract {file_name} in a worker process")
+                    # Results of the file's remaining shards are dropped when they arrive
+                    forget(file_path)
+                    continue
+
+                if kind == "hash":
+                    file_hash, hashes = result
+                    record = processed_files.get(file_path)
+                    if hashes is None:
+                        logging.info(f"No changes detected in {file_name}. Skipping.")
+                        processed_files[file_path] = update_file_record(record, file_hash, stats.pop(file_path))
+                        continue
+
+                    logging.info(f"Processing new or updated file: {file_name}")
+                    file_hashes[file_path] = file_hash
+                    page_hashes[file_path] = hashes
+                    changed = plan_page_update(record, hashes)
+                    ranges = page_ranges(len(hashes))
+                    if changed is not None:
+                        changed_pages[file_path] = changed
+                        submit("pages", file_path, extract_changed_pages, file_path, record["chunks"], changed)
+                    elif len(ranges) <= 1 or get_page_cache().contains(file_hash):
+                        submit("chunks", file_path, extract_and_chunk, file_path, file_hash)
+                    else:
+                        shards[file_path] = [None] * len(ranges)
+                        for i, (start, end) in enumerate(ranges):
+                            submit("shard", file_path, extract_page_range, file_path, start, end, index=i)
+
+                elif kind == "shard":
+                    parts = shards.get(file_path)
+                    if parts is None:
+                        continue
+                    parts[index] = result
+                    if all(part is not None for part in parts):
+                        del shards[file_path]
+                        submit("chunks", file_path, chunk_page_ranges, parts, file_hashes[file_path])
+
+                elif file_path in file_hashes:
+                    logging.info(f"Storing new or updated file: {file_name}")
+                    try:
+                        if kind == "pages":
+                            record = processed_files[file_path]
+                            replacements, extracted = result
+                            chunk_records = apply_replacements(file_path, record["chunks"], replacements)
+                            update_page_cache(record["hash"], file_hashes[file_path], changed_pages[file_path], extracted)
+                        else:
+                            chunk_records = store_chunks(file_path, result)
+                            remove_stale_chunks(file_path, processed_files.get(file_path), chunk_records)
+                    except Exception:
+                        logging.exception(f"Failed to store chunks from {file_name}")
+                        forget(file_path)
+                        continue
+                    processed_files[file_path] = make_file_record(
+                        file_hashes[file_path], stats[file_path], page_hashes[file_path], chunk_records,
+                        time.perf_counter() - started[file_path]
+                    )
+                    forget(file_path)
+
+def rebuild_from_page_cache(processed_files: Manifest) -> None:
+    """
+    Re-chunk, re-embed and store every file in the manifest from the page cache alone,
+    without opening the PDFs, e.g. after changing the chunking settings or the embedding
+    model or its quantization: stored chunks whose vector came from another embedding
+    variant get a new one. Files whose pages
+    are not cached (such as files updated page by page while their previous version was not
+    cached) are left as they are.
+    """
+    missing = []
+    for file_path, record in processed_files.items():
+        file_name = os.path.basename(file_path)
+        if not isinstance(record, dict) or not get_page_cache().contains(record["hash"]):
+            missing.append(file_name)
+            continue
+
+        logging.info(f"Rebuilding {file_name} from the page cache")
+        start = time.perf_counter()
+        chunk_records = chunk_and_store_pdf(file_path, file_hash=record["hash"])
+        remove_stale_chunks(file_path, record, chunk_records)
+        processed_files[file_path] = {
+            **record,
+            "chunks": chunk_records,
+            "extractor": extractor.name,
+            "format": EXTRACTION_VERSION,
+            "storage": STORAGE_VERSION,
+            "chunking": get_chunking().settings,
+            "embedding": EMBEDDING_VARIANT,
+            "ingest_seconds": round(time.perf_counter() - start, 3)
+        }
+
+    logging.info(f"Rebuilt {len(processed_files) - len(missing)} of {len(processed_files)} files from the page cache.")
+    if missing:
+        logging.warning(f"Not in the page cache (ingest them normally to re-extract): {', '.join(missing)}")
+
+def watch_pdf_store(processed_files: Manifest, workers: int = 1) -> None:
+    """
+    Ingest PDF files as they are added to, modified in or removed from the PDF store.
+
+    Filesystem notifications drive the updates, so only the files that changed are looked
+    at. A new or modified file is ingested once its size and mtime have been stable for
+    WATCH_SETTLE_SECONDS, which skips files that are still being copied. Runs until interrupted.
+    """
+    pending: Dict[str, Tuple[float, Optional[Tuple[int, int]]]] = {}  # path -> (last change, size/mtime)
+
+    def signature(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    logging.info(f"Watching {PDF_STORE} for changes.")
+    for changes in watch(
+        PDF_STORE,
+        watch_filter=lambda change, path: path.lower().endswith(".pdf"),
+        recursive=False,
+        rust_timeout=int(WATCH_SETTLE_SECONDS * 1000),
+        yield_on_timeout=True
+    ):
+        now = time.monotonic()
+        deleted = []
+        for change, path in changes:
+            # Key files the same way as list_pdf_files so manifest entries match
+            file_path = os.path.join(PDF_STORE, os.path.basename(path))
+            if change == Change.deleted and not os.path.exists(file_path):
+                pending.pop(file_path, None)
+                deleted.append(file_path)
+            else:
+                pending[file_path] = (now, signature(file_path))
+
+        ready = []
+        for file_path, (changed_at, last_signature) in list(pending.items()):
+            if now - changed_at < WATCH_SETTLE_SECONDS:
+                continue
+            current = signature(file_path)
+            if current is None:
+                del pending[file_path]
+            elif current != last_signature:
+                pending[file_path] = (now, current)
+            else:
+                del pending[file_path]
+                ready.append(file_path)
+
+        if not deleted and not ready:
+            continue
+
+        try:
+            remove_files(deleted, processed_files)
+            ingest_serial(ready, processed_files, workers)
+        except Exception:
+            logging.exception("Failed to ingest changes from the PDF store")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the PDFs in the PDF store into ChromaDB.")
+    parser.add_argument(
+        "--workers", type=int, default=INGEST_WORKERS,
+        help="number of extraction worker processes (1 processes files serially)"
+    )
+    parser.add_argument(
+        "--rebuild-from-cache", action="store_true",
+        help="re-chunk and re-embed the files in the manifest from cached page text instead of scanning the PDF store"
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="after ingesting, keep running and ingest files as they change in the PDF store"
+    )
+    args = parser.parse_args()
+
+    confirm_project_paths()
+    processed_files = load_processed_files()
+    logging.info(f"{len(processed_files)} files in the processed files manifest.")
+
+    if args.rebuild_from_cache:
+        rebuild_from_page_cache(processed_files)
+    else:
+        pdf_files = list_pdf_files()
+        remove_deleted_files(pdf_files, processed_files)
+        if args.workers > 1 and len(pdf_files) > 1:
+            ingest_parallel(pdf_files, processed_files, args.workers)
+        else:
+            ingest_serial(pdf_files, processed_files, args.workers)
+    # Only report on the database and model if this run needed them
+    if is_loaded(get_embedding_cache):
+        logging.info(get_embedding_cache().report())
+        logging.info(get_embedding_model().padding.report())
+    if is_loaded(get_chunk_store):
+        logging.info(get_chunk_store().report(processed_files.chunk_count()))
+    get_page_cache().prune(processed_files.replaced_hashes, processed_files.file_hashes())
 
-    save_processed_files(processed_files)
+    if args.watch:
+        try:
+            watch_pdf_store(processed_files, args.workers)
+        except KeyboardInterrupt:
+            logging.info("Stopped watching the PDF store.")
+        if is_loaded(get_embedding_cache):
+            logging.info(get_embedding_cache().report())
+            logging.info(get_embedding_model().padding.report())
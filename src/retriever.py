@@ -1,9 +1,9 @@
 import logging
 import chromadb
-from sentence_transformers import SentenceTransformer
 from typing import Dict, List, Union, Any
 
-from config import CHROMADB_PATH, DB_COLLECTION, EMBEDDING_MODEL_NAME, DEFAULT_N_RESULTS
+from config import CHROMADB_PATH, DB_COLLECTION, DEFAULT_N_RESULTS
+from embedding_backends import create_embedding_backend
 
 
 # Setup logging
@@ -15,7 +15,7 @@ class Retriever:
         try:
             self.client = chromadb.PersistentClient(path=CHROMADB_PATH)
             self.collection = self.client.get_or_create_collection(DB_COLLECTION)
-            self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+            self.embedding_model = create_embedding_backend()
             logging.info("Retriever initialized successfully.")
         except Exception as e:
             logging.error(f"Failed to initialize Retriever: {e}")
@@ -33,7 +33,7 @@ class Retriever:
             Dict[str, List[str]]: The search results containing the most relevant RPG rules.
         """
         try:
-            query_embedding = self.embedding_model.encode(query)
+            query_embedding = self.embedding_model.encode([query])[0]
             search_results = self.collection.query(
                 query_embeddings=[query_embedding],
                 n_results=n_results,
@@ -0,0 +1,131 @@
+import logging
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# A piece of the text being split: [start, end) offsets and its length
+Piece = Tuple[int, int, int]
+
+
+class RecursiveTextSplitter:
+    """
+    Recursive separator splitter with the semantics of langchain's RecursiveCharacterTextSplitter
+    (separators kept at the start of each split, chunks stripped of surrounding whitespace, the
+    same overlap merging), producing identical chunks along with their character offsets.
+
+    Splits are tracked as offsets into the original text rather than as copies, which is what
+    gives every chunk its offset. Splitting is about as fast as langchain's; what this saves is
+    importing langchain (over half a second and some 40 MB of RSS) in every ingestion process.
+
+    This is the same recursive algorithm, not a single-pass one: a split is only scanned for
+    the next separator when it is still longer than a chunk. In book text few are, so finding
+    every separator in one pass up front would do more work, not less.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        separators: List[str],
+        length_function: Optional[Callable[[str], int]] = None
+    ) -> None:
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap}) is larger than chunk size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators
+        self.length_function = length_function
+
+    def measure(self, texts: List[str]) -> List[int]:
+        """
+        Measure the length of each text. Subclasses can override this to measure a whole
+        level of splits at once.
+        """
+        if self.length_function is None:
+            return [len(text) for text in texts]
+        return [self.length_function(text) for text in texts]
+
+    def split_text(self, text: str) -> List[str]:
+        return [chunk for _, chunk in self.split_text_with_offsets(text)]
+
+    def split_text_with_offsets(self, text: str) -> List[Tuple[int, str]]:
+        """
+        Split text into overlapping chunks, each returned with its character offset in text.
+        """
+        chunks: List[Tuple[int, str]] = []
+        self._split(text, 0, len(text), self.separators, chunks)
+        return chunks
+
+    def _split(self, text: str, start: int, end: int, separators: List[str], chunks: List[Tuple[int, str]]) -> None:
+        # Use the first separator that occurs in the text, and the ones after it to split further
+        separator = separators[-1]
+        next_separators: List[str] = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                next_separators = separators[i + 1:]
+                break
+
+        # Each split starts at a separator occurrence and runs up to the next one
+        bounds = [start]
+        if separator:
+            position = text.find(separator, start, end)
+            while position != -1:
+                if position > start:
+                    bounds.append(position)
+                position = text.find(separator, position + len(separator), end)
+        else:
+            bounds = list(range(start, end))
+        bounds.append(end)
+
+        spans = [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+        lengths = self.measure([text[a:b] for a, b in spans])
+
+        good: List[Piece] = []
+        for (a, b), length in zip(spans, lengths):
+            if length < self.chunk_size:
+                good.append((a, b, length))
+                continue
+            if good:
+                self._merge(text, good, chunks)
+                good = []
+            if next_separators:
+                self._split(text, a, b, next_separators, chunks)
+            else:
+                chunks.append((a, text[a:b]))
+        if good:
+            self._merge(text, good, chunks)
+
+    def _merge(self, text: str, pieces: List[Piece], chunks: List[Tuple[int, str]]) -> None:
+        """
+        Merge consecutive pieces into chunks of at most chunk_size, starting each new chunk
+        with the trailing pieces of the previous one that fit within chunk_overlap.
+        """
+        current: Deque[Piece] = deque()
+        total = 0
+        for piece in pieces:
+            length = piece[2]
+            if total + length > self.chunk_size:
+                if total > self.chunk_size:
+                    logging.warning(f"Created a chunk of size {total}, which is longer than the specified {self.chunk_size}")
+                if current:
+                    self._emit(text, current[0][0], current[-1][1], chunks)
+                    while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                        total -= current.popleft()[2]
+            current.append(piece)
+            total += length
+        if current:
+            self._emit(text, current[0][0], current[-1][1], chunks)
+
+    @staticmethod
+    def _emit(text: str, start: int, end: int, chunks: List[Tuple[int, str]]) -> None:
+        raw = text[start:end]
+        chunk = raw.strip()
+        if chunk:
+            chunks.append((start + len(raw) - len(raw.lstrip()), chunk))
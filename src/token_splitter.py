@@ -0,0 +1,35 @@
+from typing import List
+
+from tokenizers import Tokenizer
+
+from splitter import RecursiveTextSplitter
+
+
+class TokenAwareTextSplitter(RecursiveTextSplitter):
+    """
+    Recursive separator splitter that measures chunk length in tokens of the embedding
+    model's tokenizer instead of characters, so chunks can be packed up to the model's
+    max sequence length without being truncated when they are embedded.
+
+    The splits at each level of the recursion are tokenized together in one batched call
+    to the fast (Rust) tokenizer, and merged with the usual overlap logic using those counts.
+    Like its base class this is the recursive algorithm, not a single-pass splitter; the
+    tokenizer calls, not the separator scans, are what its time goes to.
+    """
+
+    def __init__(self, tokenizer: Tokenizer, chunk_size: int, chunk_overlap: int, separators: List[str]) -> None:
+        # A private copy: the model's tokenizer has truncation switched on while it encodes
+        self.tokenizer = Tokenizer.from_str(tokenizer.to_str())
+        self.tokenizer.no_truncation()
+        self.tokenizer.no_padding()
+        super().__init__(chunk_size, chunk_overlap, separators)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count the tokens of each text (without special tokens) in one batched call.
+        encode_batch_fast skips the character offsets, which are not needed here.
+        """
+        return [len(encoding.ids) for encoding in self.tokenizer.encode_batch_fast(texts, add_special_tokens=False)]
+
+    def measure(self, texts: List[str]) -> List[int]:
+        return self.count_tokens(texts) if texts else []
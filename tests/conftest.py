@@ -0,0 +1,123 @@
+"""
+Shared test setup: src/ and benchmarks/ on the import path, and an ingestion environment
+with an in-memory collection and a hash-based embedder in place of ChromaDB and the model.
+"""
+import copy
+import hashlib
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "src"))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "benchmarks"))
+
+DIMENSION = 16
+
+
+class FakeCollection:
+    """
+    The part of a ChromaDB collection the chunk store uses, held in a dict. Like ChromaDB,
+    update (and upsert of an existing id) merges the given metadata into the stored metadata.
+    """
+
+    def __init__(self) -> None:
+        self.records: Dict[str, Dict[str, Any]] = {}
+
+    def count(self) -> int:
+        return len(self.records)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Sequence[str] = ("metadatas", "documents")
+    ) -> Dict[str, Any]:
+        selected = list(self.records) if ids is None else [key for key in ids if key in self.records]
+        if where:
+            selected = [
+                key for key in selected
+                if all(self.records[key]["metadata"].get(name) == value for name, value in where.items())
+            ]
+        if limit is not None:
+            selected = selected[offset:offset + limit]
+        result: Dict[str, Any] = {"ids": selected}
+        for field, name in (("metadatas", "metadata"), ("documents", "document"), ("embeddings", "embedding")):
+            if field in include:
+                result[field] = [copy.deepcopy(self.records[key][name]) for key in selected]
+        return result
+
+    def upsert(self, ids: List[str], documents: List[str], embeddings: List[Any], metadatas: List[Dict[str, Any]]) -> None:
+        for key, document, embedding, metadata in zip(ids, documents, embeddings, metadatas):
+            previous = self.records.get(key, {}).get("metadata", {})
+            self.records[key] = {
+                "document": document, "embedding": list(np.asarray(embedding)), "metadata": {**previous, **metadata}
+            }
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        for key, metadata in zip(ids, metadatas):
+            self.records[key]["metadata"].update(metadata)
+
+    def delete(self, ids: List[str]) -> None:
+        for key in ids:
+            self.records.pop(key, None)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return copy.deepcopy(self.records)
+
+
+class HashEmbedder:
+    """
+    Embeds each text as a vector derived from its hash, so equal texts get equal vectors.
+    """
+    dimension = DIMENSION
+    cache_name = "hash"
+
+    def encode(self, texts: List[str], max_batch_tokens: Optional[int] = None) -> np.ndarray:
+        return np.array([
+            np.frombuffer(hashlib.blake2b(text.encode(), digest_size=DIMENSION).digest(), dtype=np.uint8)
+            for text in texts
+        ], dtype=np.float32)
+
+
+class PassthroughCache:
+    """
+    An embedding cache that never hits.
+    """
+
+    def encode(self, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        return encode(texts)
+
+
+@pytest.fixture
+def new_store(tmp_path, monkeypatch) -> Callable[[], FakeCollection]:
+    """
+    Point process_pdfs at the hash embedder, character chunking and a page cache in
+    tmp_path. Returns a function that points it at a new, empty in-memory chunk store
+    and returns that store's collection.
+    """
+    import process_pdfs
+    from chunk_store import ChunkStore
+    from page_cache import PageCache
+    from splitter import RecursiveTextSplitter
+
+    embedder = HashEmbedder()
+    page_cache = PageCache(process_pdfs.extractor.name, str(tmp_path / "page_cache"))
+    chunking = process_pdfs.Chunking(RecursiveTextSplitter(400, 80, process_pdfs.separators), "characters:400/80", 6400)
+    monkeypatch.setattr(process_pdfs, "get_embedding_model", lambda: embedder)
+    monkeypatch.setattr(process_pdfs, "get_embedding_cache", lambda: PassthroughCache())
+    monkeypatch.setattr(process_pdfs, "get_page_cache", lambda: page_cache)
+    monkeypatch.setattr(process_pdfs, "get_chunking", lambda: chunking)
+
+    def switch() -> FakeCollection:
+        collection = FakeCollection()
+        chunk_store = ChunkStore(collection, DIMENSION, embedding=embedder.cache_name)
+        monkeypatch.setattr(process_pdfs, "get_chunk_store", lambda: chunk_store)
+        return collection
+
+    return switch
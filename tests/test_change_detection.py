@@ -0,0 +1,41 @@
+"""
+Files are hashed with SHA-256, and manifest entries hashed with MD5 or BLAKE2b by older
+versions are still recognised as unchanged.
+"""
+import hashlib
+
+import pytest
+
+import process_pdfs
+
+
+@pytest.fixture
+def pdf(tmp_path) -> str:
+    path = tmp_path / "book.pdf"
+    path.write_bytes(b"%PDF-1.4 rules" * 10_000)
+    return str(path)
+
+
+def test_file_hash_is_sha256(pdf):
+    with open(pdf, "rb") as f:
+        assert process_pdfs.compute_file_hash(pdf) == hashlib.sha256(f.read()).hexdigest()
+
+
+@pytest.mark.parametrize("algorithm", ["md5", "blake2b"])
+def test_entries_of_older_versions_are_recognised(pdf, algorithm):
+    (previous_hash,) = process_pdfs.hash_file(pdf, algorithm)
+    record = previous_hash if algorithm == "md5" else {"hash": previous_hash}
+
+    file_hash, unchanged = process_pdfs.check_file_hash(pdf, record)
+    assert unchanged
+    # A matching BLAKE2b entry keeps its digest, which its cached pages are stored under
+    assert file_hash == (process_pdfs.compute_file_hash(pdf) if algorithm == "md5" else previous_hash)
+
+
+@pytest.mark.parametrize("record", [
+    "0" * 32, {"hash": "0" * 32}, {"hash": "0" * 64}, None
+], ids=["md5", "blake2b", "sha256", "new file"])
+def test_changed_files_get_a_sha256_hash(pdf, record):
+    file_hash, unchanged = process_pdfs.check_file_hash(pdf, record)
+    assert not unchanged
+    assert file_hash == process_pdfs.compute_file_hash(pdf)
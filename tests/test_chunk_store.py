@@ -0,0 +1,110 @@
+"""
+The chunk store keeps one entry per distinct chunk text with every place it occurs,
+and serializes its updates across processes with its lock file.
+"""
+import fcntl
+
+import numpy as np
+import pytest
+
+from chunk_store import ChunkStore
+from conftest import DIMENSION, FakeCollection
+
+
+def occurrence(source: str, chunk_index: int = 0):
+    return {"source": source, "chunk_index": chunk_index, "page_start": 1, "page_end": 1, "start_offset": 0, "end_offset": 4}
+
+
+@pytest.mark.parametrize("method, args", [
+    ("add", ([("text", np.zeros(DIMENSION), occurrence("a.pdf"))],)),
+    ("set_source", ("a.pdf", ["key"], {})),
+    ("remove_legacy", ("a.pdf",)),
+])
+def test_updates_hold_the_lock(tmp_path, method, args):
+    lock_path = str(tmp_path / "chunk_store.lock")
+    collection = FakeCollection()
+    chunk_store = ChunkStore(collection, DIMENSION, lock_path=lock_path)
+    held = []
+
+    def check_lock(*args, **kwargs):
+        with open(lock_path, "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                held.append(True)
+            else:
+                held.append(False)
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return get(*args, **kwargs)
+
+    get = collection.get
+    collection.get = check_lock
+    getattr(chunk_store, method)(*args)
+
+    assert held and all(held)
+    # And it is released afterwards
+    with open(lock_path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def test_repeated_text_is_stored_once():
+    collection = FakeCollection()
+    chunk_store = ChunkStore(collection, DIMENSION)
+    keys = chunk_store.add([
+        ("same text", np.zeros(DIMENSION), occurrence("a.pdf", 0)),
+        ("same text", np.zeros(DIMENSION), occurrence("b.pdf", 3)),
+    ])
+
+    assert keys[0] == keys[1]
+    assert collection.count() == 1
+    assert collection.records[keys[0]]["metadata"]["occurrence_count"] == 2
+
+    assert chunk_store.set_source("a.pdf", keys, {}) == 0
+    assert chunk_store.set_source("b.pdf", keys, {}) == 1
+    assert collection.count() == 0
+
+
+def test_vectors_of_another_embedding_variant_are_replaced():
+    collection = FakeCollection()
+    (key,) = ChunkStore(collection, DIMENSION, embedding="model").add([("text", np.zeros(DIMENSION), occurrence("a.pdf"))])
+
+    chunk_store = ChunkStore(collection, DIMENSION, embedding="model.int8-onnx")
+    assert chunk_store.add([("text", np.ones(DIMENSION), occurrence("b.pdf"))]) == [key]
+
+    record = collection.records[key]
+    assert record["embedding"] == list(np.ones(DIMENSION))
+    assert record["metadata"]["embedding"] == "model.int8-onnx"
+    assert record["metadata"]["occurrence_count"] == 2
+    assert chunk_store.reembedded == 1
+
+    # Once replaced, adding the text again only adds the occurrence
+    chunk_store.add([("text", np.full(DIMENSION, 2.0), occurrence("c.pdf"))])
+    assert collection.records[key]["embedding"] == list(np.ones(DIMENSION))
+    assert chunk_store.reembedded == 1
+
+
+def test_occurrence_updates_keep_the_embedding_variant():
+    collection = FakeCollection()
+    chunk_store = ChunkStore(collection, DIMENSION, embedding="model")
+    (key,) = chunk_store.add([("text", np.zeros(DIMENSION), occurrence("a.pdf"))])
+
+    # A store that does not know the variant neither replaces nor relabels the vector
+    ChunkStore(collection, DIMENSION).add([("text", np.ones(DIMENSION), occurrence("b.pdf"))])
+    chunk_store.set_source("a.pdf", [key], {})
+
+    assert collection.records[key]["metadata"]["embedding"] == "model"
+    assert collection.records[key]["embedding"] == list(np.zeros(DIMENSION))
+
+
+def test_only_other_files_chunks_count_as_duplicates():
+    chunk_store = ChunkStore(FakeCollection(), DIMENSION)
+    chunk_store.add([("text", np.zeros(DIMENSION), occurrence("a.pdf", 0))])
+
+    # Re-ingesting a.pdf, and a.pdf repeating its own text, add no duplicates
+    chunk_store.add([("text", np.zeros(DIMENSION), occurrence("a.pdf", 0))])
+    chunk_store.add([("text", np.zeros(DIMENSION), occurrence("a.pdf", 7))])
+    assert chunk_store.duplicates == 0
+
+    chunk_store.add([("text", np.zeros(DIMENSION), occurrence("b.pdf", 0))])
+    assert chunk_store.duplicates == 1
+    assert chunk_store.duplicate_text_bytes == len("text")
@@ -0,0 +1,39 @@
+"""
+Length-bucketed batches keep padding within the token budget, and the padding they save is
+measured against the batches each backend used before.
+"""
+from embedding_backends import OnnxBackend, PaddingStats, SentenceTransformerBackend, plan_batches
+
+
+def test_batches_stay_within_the_budget():
+    lengths = [5, 120, 7, 128, 64, 6, 100, 8]
+    batches = plan_batches(lengths, 256)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    assert all(len(batch) * max(lengths[i] for i in batch) <= 256 for batch in batches)
+
+
+def test_previous_batches_are_the_ones_each_backend_used():
+    texts = [f"text {'x' * (i % 7)}" for i in range(70)]
+
+    onnx = OnnxBackend.previous_batches(texts)
+    assert [len(batch) for batch in onnx] == [32, 32, 6]
+    assert sum(onnx, []) == list(range(70))
+
+    # sentence-transformers' encode sorts its input longest first before batching it
+    sentence_transformers = SentenceTransformerBackend.previous_batches(texts)
+    assert [len(batch) for batch in sentence_transformers] == [32, 32, 6]
+    order = sum(sentence_transformers, [])
+    assert sorted(order) == list(range(70))
+    assert [len(texts[i]) for i in order] == sorted((len(text) for text in texts), reverse=True)
+
+
+def test_padding_is_compared_with_the_previous_batches():
+    padding = PaddingStats("batches of 2 in document order")
+    lengths = [10, 100, 10, 100]
+    padding.add(lengths, [[0, 2], [1, 3]], [[0, 1], [2, 3]])
+
+    assert padding.tokens == 220
+    assert padding.padded == 220
+    assert padding.previous_padded == 400
+    assert "45.0% of encoder tokens in batches of 2 in document order, 0.0% length-bucketed" in padding.report()
@@ -0,0 +1,51 @@
+"""
+Files ingested with another embedding variant (model, backend or quantization) must be
+re-ingested even if they are unchanged, replacing every stored vector in place.
+"""
+import os
+
+import process_pdfs
+from chunk_store import ChunkStore
+from conftest import DIMENSION, HashEmbedder
+from synthetic_pdf import write_synthetic_pdf
+
+
+class QuantizedHashEmbedder(HashEmbedder):
+    """
+    The hash embedder under another variant name, giving different vectors.
+    """
+    cache_name = "hash.int8-onnx"
+
+    def encode(self, texts, max_batch_tokens=None):
+        return super().encode(texts, max_batch_tokens) + 1
+
+
+def test_changed_variant_replaces_every_vector(tmp_path, new_store, monkeypatch):
+    path = write_synthetic_pdf(str(tmp_path / "book.pdf"), 6, lines_per_page=10)
+    collection = new_store()
+    monkeypatch.setattr(process_pdfs, "EMBEDDING_VARIANT", HashEmbedder.cache_name)
+    record = process_pdfs.ingest_file(path, None, process_pdfs.compute_file_hash(path), os.stat(path))
+    before = collection.snapshot()
+    assert record["embedding"] == HashEmbedder.cache_name
+    assert process_pdfs.record_is_current(record)
+
+    embedder = QuantizedHashEmbedder()
+    chunk_store = ChunkStore(collection, DIMENSION, embedding=embedder.cache_name)
+    monkeypatch.setattr(process_pdfs, "EMBEDDING_VARIANT", embedder.cache_name)
+    monkeypatch.setattr(process_pdfs, "get_embedding_model", lambda: embedder)
+    monkeypatch.setattr(process_pdfs, "get_chunk_store", lambda: chunk_store)
+    assert not process_pdfs.record_is_current(record)
+    assert process_pdfs.plan_page_update(record, record["pages"]) is None
+
+    updated = process_pdfs.ingest_file(path, record, record["hash"], os.stat(path))
+
+    assert updated["embedding"] == embedder.cache_name
+    assert updated["chunks"] == record["chunks"]
+    assert chunk_store.reembedded == len(before)
+    after = collection.snapshot()
+    assert after.keys() == before.keys()
+    for key, entry in after.items():
+        assert entry["metadata"]["embedding"] == embedder.cache_name
+        assert entry["embedding"] == list(embedder.encode([entry["document"]])[0])
+        # The file's occurrences are replaced, not added a second time
+        assert entry["metadata"]["occurrences"] == before[key]["metadata"]["occurrences"]
@@ -0,0 +1,147 @@
+"""
+Re-ingesting the changed pages of a PDF (extract_changed_pages and apply_replacements)
+must leave the chunk store and the manifest entry exactly as re-ingesting it in full would.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+import process_pdfs
+from synthetic_pdf import write_synthetic_pdf
+
+PAGES = 12
+LINES_PER_PAGE = 10
+
+
+def write_book(path: str, edited_pages: Optional[Dict[int, int]] = None, forms: bool = False) -> str:
+    return write_synthetic_pdf(path, PAGES, lines_per_page=LINES_PER_PAGE, edited_pages=edited_pages, forms=forms)
+
+
+def ingest(path: str, record: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return process_pdfs.ingest_file(path, record, process_pdfs.compute_file_hash(path), os.stat(path))
+
+
+@pytest.fixture
+def regions(monkeypatch) -> List[List[process_pdfs.Replacement]]:
+    """
+    The replacements of every page-level update, recorded as extract_changed_pages returns them.
+    """
+    calls = []
+    extract_changed_pages = process_pdfs.extract_changed_pages
+
+    def recording(*args):
+        result = extract_changed_pages(*args)
+        calls.append(result[0])
+        return result
+
+    monkeypatch.setattr(process_pdfs, "extract_changed_pages", recording)
+    return calls
+
+
+def update_book(tmp_path, new_store, edited_pages: Dict[int, int], forms: bool = False):
+    """
+    Ingest a book, edit some of its pages and ingest it again, then ingest the edited book
+    in full into an empty store. Returns the records and store contents of both ingests.
+    """
+    path = write_book(str(tmp_path / "book.pdf"), forms=forms)
+    collection = new_store()
+    record = ingest(path)
+    write_book(path, edited_pages, forms)
+    updated = ingest(path, record)
+
+    reference = new_store()
+    full_records = process_pdfs.chunk_and_store_pdf(path)
+    return record, updated, collection.snapshot(), full_records, reference.snapshot()
+
+
+@pytest.mark.parametrize("edited_pages", [
+    {5: LINES_PER_PAGE},
+    {1: LINES_PER_PAGE},
+    {PAGES: LINES_PER_PAGE},
+    {5: LINES_PER_PAGE, 6: LINES_PER_PAGE},
+    {2: LINES_PER_PAGE, 10: 3 * LINES_PER_PAGE},
+], ids=["middle page", "first page", "last page", "neighbouring pages", "distant pages"])
+def test_page_update_matches_full_ingest(tmp_path, new_store, regions, edited_pages):
+    _, updated, stored, full_records, reference = update_book(tmp_path, new_store, edited_pages)
+
+    assert len(regions) == 1, "the file was re-ingested in full instead of page by page"
+    assert updated["chunks"] == full_records
+    assert stored == reference
+
+
+def test_neighbouring_changed_pages_share_a_region(tmp_path, new_store, regions):
+    update_book(tmp_path, new_store, {5: LINES_PER_PAGE, 6: LINES_PER_PAGE})
+    assert len(regions[0]) == 1
+
+
+def test_distant_changed_pages_get_a_region_each(tmp_path, new_store, regions):
+    update_book(tmp_path, new_store, {2: LINES_PER_PAGE, 10: LINES_PER_PAGE})
+    assert len(regions[0]) == 2
+
+
+@pytest.mark.parametrize("page", [1, PAGES], ids=["first page", "last page"])
+def test_region_at_either_end_of_the_book(tmp_path, new_store, regions, page):
+    record, updated, _, _, _ = update_book(tmp_path, new_store, {page: LINES_PER_PAGE})
+
+    (region,) = regions[0]
+    if page == 1:
+        assert region.first_chunk == 0
+        assert updated["chunks"][-1] == record["chunks"][-1]
+    else:
+        assert region.end_chunk == len(record["chunks"])
+        assert updated["chunks"][0] == record["chunks"][0]
+
+
+def test_chunks_after_a_longer_page_are_renumbered(tmp_path, new_store, regions):
+    record, updated, stored, _, _ = update_book(tmp_path, new_store, {3: 3 * LINES_PER_PAGE})
+
+    (region,) = regions[0]
+    added = len(region.chunks) - (region.end_chunk - region.first_chunk)
+    assert added > 0
+    assert len(updated["chunks"]) == len(record["chunks"]) + added
+    # The chunks after the region are kept as they were, only their chunk_index moves
+    assert updated["chunks"][region.first_chunk + len(region.chunks):] == record["chunks"][region.end_chunk:]
+
+    indexes = sorted(
+        occurrence["chunk_index"]
+        for entry in stored.values()
+        for occurrence in json.loads(entry["metadata"]["occurrences"])
+    )
+    assert indexes == list(range(len(updated["chunks"])))
+
+
+def test_page_update_caches_the_new_version(tmp_path, new_store, regions):
+    _, updated, _, _, _ = update_book(tmp_path, new_store, {5: LINES_PER_PAGE})
+    page_cache = process_pdfs.get_page_cache()
+
+    assert page_cache.contains(updated["hash"])
+    path = str(tmp_path / "book.pdf")
+    assert list(page_cache.iter_pages(updated["hash"])) == list(process_pdfs.extractor.iter_pages(path))
+
+
+def test_page_drawn_through_a_form_is_updated(tmp_path, new_store, regions):
+    # Every page's own content stream is the same; only the form it draws changes
+    before = process_pdfs.compute_page_hashes(write_book(str(tmp_path / "before.pdf"), forms=True))
+    after = process_pdfs.compute_page_hashes(write_book(str(tmp_path / "after.pdf"), {5: LINES_PER_PAGE}, forms=True))
+    assert [i + 1 for i, (old, new) in enumerate(zip(before, after)) if old != new] == [5]
+
+    _, updated, stored, full_records, reference = update_book(tmp_path, new_store, {5: LINES_PER_PAGE}, forms=True)
+    assert len(regions) == 1
+    assert updated["chunks"] == full_records
+    assert stored == reference
+
+
+def test_change_no_page_hash_covers_is_ingested_in_full(tmp_path, new_store, regions, monkeypatch):
+    path = write_book(str(tmp_path / "book.pdf"))
+    collection = new_store()
+    record = ingest(path)
+    write_book(path, {5: LINES_PER_PAGE})
+    monkeypatch.setattr(process_pdfs, "compute_page_hashes", lambda file: record["pages"])
+    updated = ingest(path, record)
+
+    reference = new_store()
+    assert not regions
+    assert updated["chunks"] == process_pdfs.chunk_and_store_pdf(path)
+    assert collection.snapshot() == reference.snapshot()
@@ -0,0 +1,112 @@
+"""
+The llama-server backend sends prompts as a chat message, so the model's chat template is
+applied as llama-run applies it, and only caps the answer length if MAX_TOKENS is set.
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+import llm_integration
+from llm_integration import LlamaServerBackend
+
+
+class FakeResponse:
+    def __init__(self, body: Optional[Dict[str, Any]] = None, lines: List[str] = ()) -> None:
+        self.body = body
+        self.lines = lines
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> Dict[str, Any]:
+        return self.body
+
+    def iter_lines(self, decode_unicode: bool = False):
+        return iter(self.lines)
+
+    def __enter__(self) -> "FakeResponse":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+class FakeSession:
+    def __init__(self, response: FakeResponse) -> None:
+        self.response = response
+        self.requests = []
+
+    def post(self, url: str, json: Dict[str, Any], **kwargs) -> FakeResponse:
+        self.requests.append((url, json))
+        return self.response
+
+    def close(self) -> None:
+        pass
+
+
+def chunk(content: str) -> str:
+    return "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": content}}]})
+
+
+@pytest.fixture
+def backend(monkeypatch) -> LlamaServerBackend:
+    backend = LlamaServerBackend()
+    monkeypatch.setattr(backend, "ensure_running", lambda: None)
+    return backend
+
+
+def test_generate_sends_a_chat_message(backend):
+    backend.session = FakeSession(FakeResponse({"choices": [{"message": {"role": "assistant", "content": "Roll twice."}}]}))
+
+    assert backend.generate("How do critical hits work?") == "Roll twice."
+    ((url, payload),) = backend.session.requests
+    assert url.endswith("/v1/chat/completions")
+    assert payload["messages"] == [{"role": "user", "content": "How do critical hits work?"}]
+    assert "max_tokens" not in payload and "n_predict" not in payload
+
+
+def test_token_cap_is_opt_in(backend, monkeypatch):
+    monkeypatch.setattr(llm_integration, "MAX_TOKENS", 64)
+    assert backend._payload("prompt")["max_tokens"] == 64
+
+
+def test_stream_yields_deltas_until_done(backend):
+    lines = [
+        "data: " + json.dumps({"choices": [{"index": 0, "delta": {"role": "assistant"}}]}),
+        "",
+        chunk("Roll "),
+        chunk("twice."),
+        "data: " + json.dumps({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}),
+        "data: [DONE]",
+        chunk("after the end"),
+    ]
+    backend.session = FakeSession(FakeResponse(lines=lines))
+
+    assert list(backend.stream("How do critical hits work?")) == ["Roll ", "twice."]
+    assert backend.session.requests[0][1]["stream"] is True
+
+
+class PiecesBackend:
+    name = "fake"
+
+    def __init__(self, pieces: List[str]) -> None:
+        self.pieces = pieces
+
+    def stream(self, prompt: str):
+        yield from self.pieces
+
+
+def streamed(pieces: List[str]) -> List[str]:
+    llm = llm_integration.LLMIntegration.__new__(llm_integration.LLMIntegration)
+    llm.backend = PiecesBackend(pieces)
+    return list(llm.stream_response("question", "context"))
+
+
+def test_colour_codes_split_across_pieces_are_removed():
+    assert "".join(streamed(["Roll \x1b[", "1;3", "2mtwice\x1b", "[0m."])) == "Roll twice."
+
+
+def test_other_escapes_do_not_hold_back_the_stream():
+    pieces = streamed(["Roll \x1b]0;title\x07", "twice", "."])
+    assert pieces == ["Roll \x1b]0;title\x07", "twice", "."]
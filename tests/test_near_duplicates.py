@@ -0,0 +1,115 @@
+"""
+Near-duplicate detection must merge reprints of a chunk (reflowed, rehyphenated, with a
+page header) and keep apart chunks that differ in what they say.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from chunk_store import ChunkStore
+from conftest import DIMENSION, FakeCollection
+from near_duplicates import NearDuplicateIndex, same_text
+from synthetic_pdf import WORDS
+
+RULE = (
+    "Fireball. A bright streak flashes from your pointing finger to a point you choose within "
+    "range and then blossoms with a low roar into an explosion of flame. Each creature in a "
+    "20-foot-radius sphere centered on that point must make a Dexterity saving throw. A target "
+    "takes 8d6 fire damage on a failed save, or half as much damage on a successful one."
+)
+
+
+@pytest.mark.parametrize("reprint", [
+    RULE.replace(" ", "\n"),
+    RULE.replace("Dexterity", "Dexter-\nity"),
+    RULE.replace("20-foot-radius", "20 foot radius"),
+    "Chapter 11 | Spells 241\n" + RULE,
+    RULE + "\nPlayer's Handbook 241",
+], ids=["whitespace", "hyphenation", "hyphens", "header", "footer"])
+def test_reprints_say_the_same(reprint):
+    assert same_text(RULE, reprint)
+    assert same_text(reprint, RULE)
+
+
+@pytest.mark.parametrize("edit", [
+    RULE.replace("8d6", "6d6"),
+    RULE.replace("20-foot", "30-foot"),
+    RULE.replace("fire damage", "cold damage"),
+    RULE.replace("half as much", "no"),
+    "Chapter 11 | Spells 241\n" + RULE.replace("Fireball.", "Fire Storm."),
+], ids=["dice", "distance", "word", "phrase", "header and title"])
+def test_edits_do_not_say_the_same(edit):
+    assert not same_text(RULE, edit)
+    assert not same_text(edit, RULE)
+
+
+def long_rule(seed: int) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(150)) + " " + RULE
+
+
+@pytest.fixture
+def chunk_store(tmp_path) -> ChunkStore:
+    index = NearDuplicateIndex(str(tmp_path / "near_duplicates.sqlite3"), 0.95, 128)
+    return ChunkStore(FakeCollection(), DIMENSION, index)
+
+
+def add(chunk_store: ChunkStore, text: str, source: str) -> str:
+    occurrence = {"source": source, "chunk_index": 0, "page_start": 1, "page_end": 1, "start_offset": 0, "end_offset": len(text)}
+    return chunk_store.add([(text, np.zeros(DIMENSION), occurrence)])[0]
+
+
+def test_reprint_is_stored_as_an_occurrence(chunk_store):
+    text = long_rule(0)
+    key = add(chunk_store, text, "core.pdf")
+
+    assert add(chunk_store, "Chapter 11 | Spells 241\n" + text.replace(" ", "\n", 20), "reprint.pdf") == key
+    assert chunk_store.collection.count() == 1
+    assert chunk_store.near_duplicate_count == 1
+
+
+def test_changed_rule_value_is_stored_apart(chunk_store):
+    text = long_rule(0)
+    key = add(chunk_store, text, "core.pdf")
+
+    assert add(chunk_store, text.replace("8d6", "10d6"), "errata.pdf") != key
+    assert chunk_store.collection.count() == 2
+    assert chunk_store.near_duplicate_count == 0
+
+
+def test_backfill_accounts_for_every_stored_chunk(tmp_path, monkeypatch):
+    collection = FakeCollection()
+    ChunkStore(collection, DIMENSION).add([
+        (long_rule(0), np.zeros(DIMENSION), {"source": "core.pdf", "chunk_index": 0}),
+        ("---- | ----", np.zeros(DIMENSION), {"source": "core.pdf", "chunk_index": 1}),
+    ])
+    collection.upsert(["core.pdf_p1_c0"], [RULE], [np.zeros(DIMENSION)], [{"source": "core.pdf"}])
+
+    index = NearDuplicateIndex(str(tmp_path / "near_duplicates.sqlite3"), 0.95, 128)
+    chunk_store = ChunkStore(collection, DIMENSION, index)
+    chunk_store.index_near_duplicates()
+    assert index.count() == collection.count() == 3
+
+    # Nothing is left to add, so later runs do not scan the collection again
+    monkeypatch.setattr(collection, "get", lambda **kwargs: pytest.fail("the collection was scanned again"))
+    chunk_store.index_near_duplicates()
+
+    # Chunks without words that are added later are accounted for as well
+    monkeypatch.undo()
+    add(chunk_store, "|  |  |", "tables.pdf")
+    assert index.count() == collection.count() == 4
+
+    chunk_store.remove_legacy("core.pdf")
+    assert index.count() == collection.count() == 3
+
+
+def test_chunks_of_another_embedding_variant_are_not_representatives(tmp_path):
+    collection = FakeCollection()
+    index = NearDuplicateIndex(str(tmp_path / "near_duplicates.sqlite3"), 0.95, 128)
+    text = long_rule(0)
+    key = add(ChunkStore(collection, DIMENSION, index, embedding="model"), text, "core.pdf")
+
+    reprint = "Chapter 11 | Spells 241\n" + text
+    assert add(ChunkStore(collection, DIMENSION, index, embedding="model.int8-onnx"), reprint, "reprint.pdf") != key
+    assert collection.count() == 2
@@ -0,0 +1,33 @@
+"""
+Pruning the page cache removes only the entries this run made obsolete, never ones another
+ingestion run may have just written for a file it has not recorded yet.
+"""
+import os
+
+from manifest import Manifest
+from page_cache import PageCache
+from pdf_extractors import PageContent
+
+
+def test_prune_removes_only_what_this_run_replaced(tmp_path):
+    page_cache = PageCache("pdfium", str(tmp_path / "page_cache"))
+    for file_hash in ("old", "new", "unrecorded", "copy"):
+        list(page_cache.store(file_hash, [PageContent(1, file_hash, "")]))
+    other_format = os.path.join(page_cache.directory, "old.pdfplumber.v1.jsonl.zst")
+    open(other_format, "wb").close()
+
+    manifest = Manifest(str(tmp_path / "manifest.sqlite3"))
+    manifest["book.pdf"] = {"hash": "old"}
+    manifest["removed.pdf"] = {"hash": "copy"}
+    manifest["same.pdf"] = {"hash": "copy"}
+    manifest["book.pdf"] = {"hash": "new"}
+    del manifest["removed.pdf"]
+    assert manifest.replaced_hashes == {"old", "copy"}
+
+    assert page_cache.prune(manifest.replaced_hashes, manifest.file_hashes()) == 2
+    assert not page_cache.contains("old")
+    assert not os.path.exists(other_format)
+    # Still used by another file, or written by a run that has not recorded it yet
+    assert page_cache.contains("copy")
+    assert page_cache.contains("unrecorded")
+    assert page_cache.contains("new")
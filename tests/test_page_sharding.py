@@ -0,0 +1,37 @@
+"""
+Extracting a PDF in page-range shards in parallel processes must give byte-identical
+text, and chunks, to extracting it serially.
+"""
+import pytest
+
+import process_pdfs
+from synthetic_pdf import write_synthetic_pdf
+
+PAGES = 11
+SHARD_SIZE = 3
+
+
+@pytest.fixture
+def pdf(tmp_path, monkeypatch) -> str:
+    monkeypatch.setattr(process_pdfs, "PAGE_SHARD_SIZE", SHARD_SIZE)
+    return write_synthetic_pdf(str(tmp_path / "book.pdf"), PAGES, lines_per_page=20, table_every=3)
+
+
+def test_page_ranges_cover_every_page_once(pdf):
+    ranges = process_pdfs.page_ranges(PAGES)
+    assert ranges == [(0, 3), (3, 6), (6, 9), (9, 11)]
+
+
+@pytest.mark.parametrize("workers", [2, 4])
+def test_sharded_text_is_identical(pdf, workers):
+    serial = process_pdfs.extract_text_from_pdf(pdf)
+    sharded = process_pdfs.extract_text_from_pdf(pdf, workers=workers)
+
+    assert serial
+    assert sharded.encode() == serial.encode()
+
+
+def test_sharded_chunks_are_identical(pdf, new_store):
+    parts = [process_pdfs.extract_page_range(pdf, start, end) for start, end in process_pdfs.page_ranges(PAGES)]
+
+    assert process_pdfs.chunk_page_ranges(parts) == process_pdfs.extract_and_chunk(pdf)
@@ -0,0 +1,71 @@
+"""
+The built-in RecursiveTextSplitter must split exactly like langchain's
+RecursiveCharacterTextSplitter, and every offset it reports must point at its chunk.
+"""
+import random
+from typing import Callable, List, Optional
+
+import pytest
+
+text_splitters = pytest.importorskip("langchain_text_splitters")
+
+from bench_splitter import SEPARATORS, book_text  # noqa: E402
+from config import CHUNK_OVERLAP, CHUNK_SIZE  # noqa: E402
+from splitter import RecursiveTextSplitter  # noqa: E402
+
+
+def edge_cases(rng: random.Random) -> List[str]:
+    long_word = "x" * 2000
+    return [
+        "",
+        "   ",
+        "short text",
+        "\n\n\n\n",
+        "....  ....\n\n..",
+        long_word,
+        f"start {long_word} middle {long_word}.{long_word}\n\nend",
+        " leading and trailing spaces \n\n  next paragraph  \n",
+        "\n\n".join("Ünïcødé wörds — “quoted” … ∑ ελληνικά 日本語テキスト" * rng.randint(1, 30) for _ in range(20)),
+        "".join(rng.choice("ab .\n") for _ in range(20000)),
+        "".join(rng.choice("abc def.\n\n\t ") for _ in range(20000)),
+    ]
+
+
+TEXTS = [book_text(200_000), book_text(50_000, seed=1)] + edge_cases(random.Random(0))
+
+
+def assert_same_chunks(
+    chunk_size: int,
+    chunk_overlap: int,
+    separators: List[str],
+    length_function: Optional[Callable[[str], int]] = None
+) -> None:
+    reference = text_splitters.RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=separators,
+        length_function=length_function or len
+    )
+    native = RecursiveTextSplitter(chunk_size, chunk_overlap, separators, length_function)
+
+    for i, text in enumerate(TEXTS):
+        located = native.split_text_with_offsets(text)
+        assert [chunk for _, chunk in located] == reference.split_text(text), f"chunks of text {i} differ"
+        assert all(text[offset:offset + len(chunk)] == chunk for offset, chunk in located), f"wrong offsets in text {i}"
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [
+    (CHUNK_SIZE, CHUNK_OVERLAP), (200, 0), (1000, 300), (50, 49), (10, 3)
+])
+@pytest.mark.parametrize("separators", [SEPARATORS, ["\n\n", "\n", " "]], ids=["default separators", "no '' fallback"])
+def test_matches_langchain(chunk_size, chunk_overlap, separators):
+    assert_same_chunks(chunk_size, chunk_overlap, separators)
+
+
+def test_matches_langchain_with_a_length_function():
+    assert_same_chunks(120, 20, SEPARATORS, lambda s: len(s.split()))
+
+
+def test_rejects_overlap_larger_than_chunks():
+    with pytest.raises(ValueError):
+        RecursiveTextSplitter(10, 11, SEPARATORS)